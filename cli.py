@@ -0,0 +1,213 @@
+"""Headless batch export of .blend files to .mesh, meant for build machines:
+
+    blender -b --python cli.py -- [--manifest manifest.json] [file.blend ...] [--output DIR]
+        [--jobs N] [--report report.json] [--native-writer] [--skip-meshpoint-validation]
+
+Every .blend is exported by its own Blender process, without objects listed every top-level mesh
+of the scene is written to its own .mesh. The manifest lists files relative to itself:
+
+    {"files": [{"path": "ships/trader_corvette.blend", "objects": ["trader_corvette"], "output": "meshes"}]}
+"""
+
+import argparse, importlib, json, os, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import bpy
+
+ADDON_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args(argv):
+    # blender keeps the arguments before the separator to itself
+    argv = argv[argv.index("--") + 1 :] if "--" in argv else []
+    parser = argparse.ArgumentParser(
+        prog="blender -b --python cli.py --",
+        description="Exports the meshes of .blend files to .mesh",
+    )
+    parser.add_argument("files", nargs="*", help=".blend files to export")
+    parser.add_argument("--manifest", help="JSON file listing the .blend files to export")
+    parser.add_argument(
+        "--output", help="folder the meshes are written to, defaults to the folder of each .blend"
+    )
+    parser.add_argument("--objects", nargs="*", help="objects to export, defaults to all")
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count() or 1, help="Blender processes run at once"
+    )
+    parser.add_argument("--report", default="export_report.json", help="JSON report to write")
+    parser.add_argument(
+        "--native-writer",
+        action="store_true",
+        help="write the meshes directly instead of through meshbuilder, experimental",
+    )
+    parser.add_argument("--skip-meshpoint-validation", action="store_true")
+    # set on the processes spawned for each file, holds the path of their own report
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # meshbuilder.exe only runs on Windows, elsewhere the meshes are written directly
+    if os.name != "nt" and not args.native_writer:
+        if not args.worker:
+            print("meshbuilder.exe needs Windows, exporting with the native writer instead")
+        args.native_writer = True
+    return args
+
+
+def get_jobs(args):
+    output = os.path.abspath(args.output) if args.output else None
+    jobs = [
+        {"path": os.path.abspath(file), "objects": args.objects, "output": output}
+        for file in args.files
+    ]
+    if args.manifest:
+        base = os.path.dirname(os.path.abspath(args.manifest))
+        with open(args.manifest, "r") as f:
+            manifest = json.load(f)
+        for entry in manifest["files"]:
+            jobs.append(
+                {
+                    "path": os.path.join(base, entry["path"]),
+                    "objects": entry.get("objects"),
+                    "output": os.path.join(base, entry["output"]) if "output" in entry else output,
+                }
+            )
+    return jobs
+
+
+def run_worker(job, args, report_file):
+    command = [
+        bpy.app.binary_path,
+        "-b",
+        # user add-ons and preferences stay out of the build, the extension is loaded below
+        "--factory-startup",
+        job["path"],
+        "--python",
+        os.path.abspath(__file__),
+        "--",
+        "--worker",
+        report_file,
+    ]
+    if job["output"]:
+        command += ["--output", job["output"]]
+    if job["objects"]:
+        command += ["--objects", *job["objects"]]
+    if args.native_writer:
+        command.append("--native-writer")
+    if args.skip_meshpoint_validation:
+        command.append("--skip-meshpoint-validation")
+
+    start = time.time()
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        with open(report_file, "r") as f:
+            report = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        # blender died before the worker could report, keep the end of its log instead
+        report = {
+            "path": job["path"],
+            "output": job["output"],
+            "error": process.stdout[-4000:],
+            "objects": [],
+        }
+    report["exit_code"] = process.returncode
+    report["elapsed"] = round(time.time() - start, 3)
+    return report
+
+
+def is_successful(report):
+    return (
+        report["exit_code"] == 0
+        and "error" not in report
+        and all(obj["status"] == "ok" for obj in report["objects"])
+    )
+
+
+def build(args):
+    jobs = get_jobs(args)
+    if not jobs:
+        print("Nothing to export, pass .blend files or a --manifest")
+        return 1
+
+    start = time.time()
+    with tempfile.TemporaryDirectory() as reports_dir:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = [
+                pool.submit(run_worker, job, args, os.path.join(reports_dir, f"{i}.json"))
+                for i, job in enumerate(jobs)
+            ]
+            files = [future.result() for future in futures]
+
+    report = {
+        "elapsed": round(time.time() - start, 3),
+        "succeeded": all(is_successful(file) for file in files),
+        "files": files,
+    }
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=4)
+
+    for file in files:
+        print(f"{'OK' if is_successful(file) else 'FAILED'} {file['path']} ({file['elapsed']}s)")
+        if "error" in file:
+            print(file["error"])
+        for obj in file["objects"]:
+            elapsed = f" ({obj['elapsed']}s)" if "elapsed" in obj else ""
+            print(f"    {obj['name']}: {obj['message']}{elapsed}")
+    print(f"Report written to: {os.path.abspath(args.report)} - Finished in: {report['elapsed']}s")
+    return 0 if report["succeeded"] else 1
+
+
+def load_extension():
+    # this file runs as a plain script, the extension is imported as the package it lives in
+    if os.path.dirname(ADDON_PATH) not in sys.path:
+        sys.path.append(os.path.dirname(ADDON_PATH))
+    package = os.path.basename(ADDON_PATH)
+    extension = importlib.import_module(package)
+    if not hasattr(bpy.types.Scene, "mesh_properties"):
+        extension.register()
+    return importlib.import_module(f"{package}.ui")
+
+
+def export_file(args):
+    report = {"path": bpy.data.filepath, "output": None, "objects": []}
+    start = time.time()
+    try:
+        ui = load_extension()
+        output = args.output or os.path.dirname(bpy.data.filepath)
+        os.makedirs(output, exist_ok=True)
+        report["output"] = output
+
+        if args.objects:
+            missing = [name for name in args.objects if name not in bpy.data.objects]
+            report["objects"] += [
+                {"name": name, "status": "error", "message": "Object not found"} for name in missing
+            ]
+            objects = [bpy.data.objects[name] for name in args.objects if name not in missing]
+        else:
+            objects = ui.get_batch_export_objects(bpy.context.scene.collection)
+
+        options = SimpleNamespace(
+            use_meshbuilder=not args.native_writer,
+            skip_meshpoint_validation=args.skip_meshpoint_validation,
+        )
+        timings = {}
+        for name, (kind, message) in ui.batch_export(options, objects, output, timings).items():
+            status = "ok" if kind == "INFO" else "error"
+            report["objects"].append(
+                {
+                    "name": name,
+                    "status": status,
+                    "message": message,
+                    "elapsed": round(timings.get(name, 0), 3),
+                }
+            )
+    except Exception as e:
+        report["error"] = str(e)
+
+    report["worker_elapsed"] = round(time.time() - start, 3)
+    with open(args.worker, "w") as f:
+        json.dump(report, f, indent=4)
+    return 0 if "error" not in report else 1
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv)
+    sys.exit(export_file(args) if args.worker else build(args))
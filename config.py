@@ -25,6 +25,9 @@ class AddonSettings:
             "is_first_installation": True,
             "current_version": "",
             "meshpoint_rules": self.meshpoint_rules,
+            "mesh_cache_size_mb": 1024,
+            "texture_cache_size_mb": 2048,
+            "image_memory_budget_mb": 2048,
         }
 
     def init(self):
@@ -35,7 +38,15 @@ class AddonSettings:
         except Exception as e:
             raise Exception(f"AddonSettings.init() could not create settings file: {e}")
 
-    def load(self, required_props=["meshpoint_rules"]):
+    def load(
+        self,
+        required_props=[
+            "meshpoint_rules",
+            "mesh_cache_size_mb",
+            "texture_cache_size_mb",
+            "image_memory_budget_mb",
+        ],
+    ):
         try:
             with open(self.filepath, "r") as f:
                 self.settings = json.load(f)
@@ -4,12 +4,31 @@ from mathutils import Matrix, Vector
 TEMP_DIR = tempfile.gettempdir()
 MESHPOINT_COLOR = (0.18039216101169586, 0.7686275243759155, 1.0)
 
+# bump whenever the shared shader group changes so older .blend files rebuild it
+SHADER_GROUP_NAME = "Sins II Shader"
+SHADER_GROUP_VERSION = 2
+
+# seconds between image memory budget checks
+IMAGE_MANAGER_INTERVAL = 5.0
+
+# the prefetcher waits for the scene to be idle and keeps its main thread time under its share
+PREFETCH_INTERVAL = 0.5
+PREFETCH_IDLE_SECONDS = 1.0
+PREFETCH_CPU_SHARE = 0.25
+
 GAME_MATRIX = Matrix(((-1, 0, 0, 0), (0, 0, 1, 0), (0, 1, 0, 0), (0, 0, 0, 1)))
 MESHPOINT_MATRIX = Matrix(((-1, 0, 0, 0), (0, 1, 0, 0), (0, 0, -1, 0), (0, 0, 0, 1)))
 
-ADDON_SETTINGS_FILE = os.path.join(
-    os.environ["LOCALAPPDATA"], "sins2", "sins2-blender-extension", "settings.json"
+# LOCALAPPDATA only exists on Windows, build machines keep the data in the XDG data folder
+LOCAL_DATA_PATH = os.environ.get("LOCALAPPDATA") or os.environ.get(
+    "XDG_DATA_HOME", os.path.join(os.path.expanduser("~"), ".local", "share")
 )
+ADDON_DATA_PATH = os.path.join(LOCAL_DATA_PATH, "sins2", "sins2-blender-extension")
+ADDON_SETTINGS_FILE = os.path.join(ADDON_DATA_PATH, "settings.json")
+MESH_CACHE_PATH = os.path.join(ADDON_DATA_PATH, "mesh_cache")
+TEXTURE_CACHE_PATH = os.path.join(ADDON_DATA_PATH, "texture_cache")
+ASSET_INDEX_FILE = os.path.join(ADDON_DATA_PATH, "asset_index.json")
+EXPORT_MANIFEST_FILE = os.path.join(ADDON_DATA_PATH, "export_manifest.json")
 
 TEMP_TEXTURES_PATH = os.path.join(TEMP_DIR, "sins2-blender-extension.tmp.textures.dir")
 
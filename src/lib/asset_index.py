@@ -0,0 +1,145 @@
+import json, os
+from .dds_reader import DDSReader
+from .helpers.filesystem import write_atomically
+
+# bump whenever the stored records change shape so stale indices are rebuilt
+INDEX_VERSION = 1
+
+
+def parse_mesh_material(file_path):
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+
+def parse_texture(file_path):
+    with open(file_path, "rb") as f:
+        reader = DDSReader(f.read(148))
+    try:
+        reader.parse_header()
+    except Exception:
+        return {"path": file_path}
+    return {
+        "path": file_path,
+        "width": reader.width,
+        "height": reader.height,
+        "mip_count": reader.mip_count,
+        "format": reader.format,
+    }
+
+
+PARSERS = {
+    ".mesh_material": parse_mesh_material,
+    ".dds": parse_texture,
+}
+
+
+class AssetIndex:
+    """Per-folder index of mod assets keyed by lowercase stem, refreshed incrementally by mtime"""
+
+    def __init__(self, index_file):
+        self.index_file = index_file
+        self.directories = None
+        self.scanned = set()
+        self.is_dirty = False
+        # folder mtimes at their last scan, and the names looked up there without a match since
+        self.mtimes = {}
+        self.misses = {}
+
+    def load(self):
+        if self.directories is None:
+            try:
+                with open(self.index_file, "r") as f:
+                    index = json.load(f)
+                self.directories = index["directories"] if index["version"] == INDEX_VERSION else {}
+            except (OSError, KeyError, json.JSONDecodeError):
+                self.directories = {}
+        return self.directories
+
+    def save(self):
+        if not self.is_dirty:
+            return
+        index = {"version": INDEX_VERSION, "directories": self.directories}
+        try:
+            write_atomically(self.index_file, json.dumps(index).encode("utf-8"))
+            self.is_dirty = False
+        except OSError as e:
+            print(f"AssetIndex.save() could not write index: {e}")
+
+    def invalidate(self):
+        """Rescans each folder on its next lookup, call once per import"""
+        self.scanned.clear()
+
+    def refresh(self, directory, extension):
+        key = f"{os.path.normcase(os.path.abspath(directory))}|{extension}"
+        entries = self.load().get(key, {})
+        try:
+            # taken before scanning so files added meanwhile still change it
+            self.mtimes[key] = os.stat(directory).st_mtime
+        except OSError:
+            return None
+        if not os.path.isdir(directory):
+            return None
+        self.misses[key] = set()
+
+        refreshed = {}
+        for file in os.scandir(directory):
+            if not file.is_file() or not file.name.lower().endswith(extension):
+                continue
+            stem = file.name[: -len(extension)].lower()
+            mtime = file.stat().st_mtime
+            entry = entries.get(stem)
+            if entry is None or entry["mtime"] != mtime or entry["name"] != file.name:
+                try:
+                    entry = {
+                        "name": file.name,
+                        "mtime": mtime,
+                        "data": PARSERS[extension](file.path),
+                    }
+                except Exception as e:
+                    print(f"AssetIndex could not parse {file.path}: {e}")
+                    continue
+                self.is_dirty = True
+            refreshed[stem] = entry
+
+        if refreshed.keys() != entries.keys():
+            self.is_dirty = True
+        self.directories[key] = refreshed
+        self.scanned.add(key)
+        return refreshed
+
+    def entries(self, directory, extension):
+        key = f"{os.path.normcase(os.path.abspath(directory))}|{extension}"
+        if key not in self.scanned:
+            return self.refresh(directory, extension)
+        return self.directories.get(key)
+
+    def is_modified(self, key, directory):
+        try:
+            return os.stat(directory).st_mtime != self.mtimes.get(key)
+        except OSError:
+            return True
+
+    def lookup(self, directory, extension, name):
+        """Returns the parsed asset, rescanning only if the folder changed since the last scan"""
+        key = f"{os.path.normcase(os.path.abspath(directory))}|{extension}"
+        entries = self.entries(directory, extension)
+        if entries is None:
+            return None
+        name = name.lower()
+        entry = entries.get(name)
+        if entry is None and name not in self.misses[key]:
+            # most textures have no _orm/_msk/_nrm, a folder is only rescanned once it changed
+            if self.is_modified(key, directory):
+                entry = (self.refresh(directory, extension) or {}).get(name)
+            if entry is None and key in self.misses:
+                self.misses[key].add(name)
+        return entry["data"] if entry else None
+
+    def mesh_material(self, directory, name):
+        return self.lookup(directory, ".mesh_material", name)
+
+    def texture(self, directory, stem):
+        return self.lookup(directory, ".dds", stem)
+
+    def has_directory(self, directory, extension):
+        return self.entries(directory, extension) is not None
@@ -1,18 +1,105 @@
 from struct import unpack
-from .helpers.mesh import Meshpoint, Primitive, Vertex
+from .helpers.mesh import Meshpoint
+import mmap
+import numpy as np
+
+# per-vertex layouts, the trailing uv1 block only exists when `has_uv1` is set
+VERTEX_DTYPE = np.dtype(
+    [("p", "<f4", 3), ("n", "<f4", 3), ("t", "<f4", 4), ("uv0", "<f4", 2), ("has_uv1", "?")]
+)
+VERTEX_UV1_DTYPE = np.dtype(VERTEX_DTYPE.descr + [("uv1", "<f4", 2)])
+PRIMITIVE_DTYPE = np.dtype(
+    [("material_index", "<i2"), ("vertex_index_start", "<u4"), ("vertex_index_count", "<u4")]
+)
+HAS_UV1_OFFSET = VERTEX_DTYPE.fields["has_uv1"][1]
+MESHPOINT_SIZE = 50  # position, rotation and bone index following the name
+HEADER_SIZE = 4
+PADDING_SIZE = 8
+SECTIONS = ["header", "vertices", "indices", "primitives", "meshpoints", "bones", "materials"]
 
 
 class BinaryReader:
     def __init__(self):
         self.offset = 0
         self.buffer = None
-        self.mesh_data = {
-            x: [] for x in ["vertices", "indices", "primitives", "materials", "meshpoints"]
-        }
+        self.sections = {}
+        self.decoded = set()
+        self._arrays = {}
+        self._materials = []
+        self._meshpoints = []
+        self._mesh_data = None
 
         self.materials_offset_start = None
         self.meshpoint_offset_start = None
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        # the mapping has to be released before the file can be rewritten on Windows
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = None
+
+    def decode(self, *sections):
+        for section in sections:
+            if section not in self.decoded:
+                self.offset = self.sections[section]
+                getattr(self, f"parse_{section}")()
+                self.decoded.add(section)
+
+    @property
+    def arrays(self):
+        self.decode("vertices", "indices", "primitives")
+        return self._arrays
+
+    @property
+    def materials(self):
+        self.decode("materials")
+        return self._materials
+
+    @property
+    def meshpoints(self):
+        self.decode("meshpoints")
+        return self._meshpoints
+
+    @property
+    def mesh_data(self):
+        """Dict based view over the decoded arrays, built on first access"""
+        if self._mesh_data is None:
+            self._mesh_data = {
+                "vertices": self.vertex_dicts(),
+                "indices": self.arrays["indices"].tolist(),
+                "primitives": [
+                    {
+                        "material_index": mat_idx,
+                        "vertex_index_start": start,
+                        "vertex_index_count": count,
+                    }
+                    for mat_idx, start, count in self.arrays["primitives"].tolist()
+                ],
+                "materials": self.materials,
+                "meshpoints": self.meshpoints,
+            }
+        return self._mesh_data
+
+    def vertex_dicts(self):
+        a = self.arrays
+        return [
+            {"p": p, "n": n, "t": t, "uv0": tuple(uv0), "uv1": tuple(uv1) if has_uv1 else None}
+            for p, n, t, uv0, uv1, has_uv1 in zip(
+                a["positions"].tolist(),
+                a["normals"].tolist(),
+                a["tangents"].tolist(),
+                a["uv0"].tolist(),
+                a["uv1"].tolist(),
+                a["has_uv1"].tolist(),
+            )
+        ]
+
     def meshpoint(self):
         name_length = self.integer()
         name = self.string(name_length)
@@ -21,24 +108,6 @@ class BinaryReader:
         bone_idx = self.short()
         return Meshpoint(name, pos, rot, bone_idx)
 
-    def primitive(self):
-        mat_idx = self.short()
-        start = self.integer()
-        end = self.integer()
-        return Primitive(mat_idx, start, end)
-
-    def vertex(self):
-        pos = self.vector3f()
-        normals = self.vector3f()
-        tangents = self.vector4f()
-        uv0 = tuple((self.float()[0], self.float()[0]))
-        has_uv1 = self.boolean()
-        if has_uv1:
-            uv1 = tuple((self.float()[0], self.float()[0]))
-        else:
-            uv1 = None
-        return Vertex(pos, normals, tangents, uv0, uv1)
-
     def bounding_box(self, result=[None, None]):
         result[0] = self.vector3f()
         result[1] = self.vector3f()
@@ -49,47 +118,153 @@ class BinaryReader:
         result[1] = self.float()[0]
         return result
 
+    def count(self):
+        count = self.integer()
+        self.skip(4)
+        return count
+
+    def index_sections(self):
+        # single pass over the section counts, nothing past the header is decoded here
+        self.sections["header"] = self.offset
+        self.string(HEADER_SIZE)  # header
+        self.boolean()  # is_skinned
+        self.bounding_box()
+        self.bounding_sphere()
+        self.skip(PADDING_SIZE)  # padding
+
+        self.sections["vertices"] = self.offset
+        vertex_count = self.count()
+        vertices = self.uniform_vertices(vertex_count)
+        if vertices is not None:
+            self.skip(vertices.nbytes)
+        else:
+            self.offset = self.vertex_offsets(vertex_count)[1]
+        del vertices
+
+        self.sections["indices"] = self.offset
+        self.skip(self.count() * 4)
+
+        self.sections["primitives"] = self.offset
+        self.skip(self.count() * PRIMITIVE_DTYPE.itemsize)
+
+        self.sections["meshpoints"] = self.offset
+        meshpoint_count = self.count()
+        self.meshpoint_offset_start = self.offset
+        for i in range(meshpoint_count):
+            self.skip(self.integer() + MESHPOINT_SIZE)
+
+        self.sections["bones"] = self.offset
+        self.count()
+
+        self.sections["materials"] = self.offset
+        self.count()
+        self.materials_offset_start = self.offset
+
+    def section_bytes(self, section):
+        start = self.sections[section]
+        index = SECTIONS.index(section)
+        end = self.sections[SECTIONS[index + 1]] if index + 1 < len(SECTIONS) else len(self.buffer)
+        return bytes(self.buffer[start:end])
+
+    def header_template(self):
+        """Header and padding bytes of the file, written as they are into exported meshes"""
+        end = self.sections["vertices"]
+        return bytes(self.buffer[:HEADER_SIZE]), bytes(self.buffer[end - PADDING_SIZE : end])
+
+    def vertex_offsets(self, vertex_count):
+        """Vertices are variable sized, each run of equally sized vertices is located at once"""
+        flags = np.frombuffer(self.buffer, dtype=np.uint8)
+        offsets = np.empty(vertex_count, dtype=np.int64)
+        offset, i, window = self.offset, 0, 64
+        while i < vertex_count:
+            has_uv1 = flags[offset + HAS_UV1_OFFSET] != 0
+            size = VERTEX_UV1_DTYPE.itemsize if has_uv1 else VERTEX_DTYPE.itemsize
+            count = min(window, vertex_count - i)
+            run = offset + size * np.arange(count, dtype=np.int64)
+            flag_offsets = run + HAS_UV1_OFFSET
+            # the run ends at the first vertex whose flag differs from the first one's
+            matches = (flag_offsets < len(flags)) & (
+                (flags[np.minimum(flag_offsets, len(flags) - 1)] != 0) == has_uv1
+            )
+            length = count if matches.all() else int(np.argmin(matches))
+            offsets[i : i + length] = run[:length]
+            i += length
+            offset += size * length
+            # long runs are checked in growing windows, so alternating layouts stay cheap
+            window = window * 2 if length == count else 64
+        return offsets, offset
+
+    def uniform_vertices(self, vertex_count):
+        # most meshes use a single layout, which can be mapped directly without a stride scan
+        remaining = len(self.buffer) - self.offset
+        for dtype, has_uv1 in ((VERTEX_UV1_DTYPE, True), (VERTEX_DTYPE, False)):
+            if dtype.itemsize * vertex_count > remaining:
+                continue
+            vertices = np.frombuffer(self.buffer, dtype, vertex_count, self.offset)
+            if (vertices["has_uv1"] == has_uv1).all():
+                return vertices
+        return None
+
     def parse_vertices(self):
         vertex_count = self.integer()
         self.skip(4)
-        for i in range(vertex_count):
-            v = self.vertex()
-            self.mesh_data["vertices"].append(
-                {
-                    "p": v.pos,
-                    "n": v.normals,
-                    "t": v.tangents,
-                    "uv0": v.uv0,
-                    "uv1": v.uv1 if v.uv1 else None,
-                }
-            )
+
+        vertices = self.uniform_vertices(vertex_count)
+        if vertices is not None:
+            self.skip(vertices.nbytes)
+            has_uv1 = vertices["has_uv1"].copy()
+            if vertices.dtype == VERTEX_UV1_DTYPE:
+                uv1 = np.ascontiguousarray(vertices["uv1"])
+            else:
+                uv1 = np.zeros((vertex_count, 2), dtype=np.float32)
+        else:
+            offsets, self.offset = self.vertex_offsets(vertex_count)
+            raw = np.frombuffer(self.buffer, dtype=np.uint8)
+            vertices = raw[offsets[:, None] + np.arange(VERTEX_DTYPE.itemsize)]
+            vertices = vertices.view(VERTEX_DTYPE)[:, 0]
+            has_uv1 = vertices["has_uv1"].copy()
+            uv1 = np.zeros((vertex_count, 2), dtype=np.float32)
+            uv1_offsets = offsets[has_uv1][:, None] + VERTEX_DTYPE.itemsize + np.arange(8)
+            uv1[has_uv1] = raw[uv1_offsets].view("<f4")
+
+        self._arrays.update(
+            {
+                "positions": np.ascontiguousarray(vertices["p"]),
+                "normals": np.ascontiguousarray(vertices["n"]),
+                "tangents": np.ascontiguousarray(vertices["t"]),
+                "uv0": np.ascontiguousarray(vertices["uv0"]),
+                "uv1": uv1,
+                "has_uv1": has_uv1,
+            }
+        )
 
     def parse_indices(self):
         indices_count = self.integer()
         self.skip(4)
-        for i in range(indices_count):
-            self.mesh_data["indices"].append(self.integer())
+        self._arrays["indices"] = np.frombuffer(
+            self.buffer, "<u4", indices_count, self.offset
+        ).copy()
+        self.skip(indices_count * 4)
 
     def parse_primitives(self):
         primitive_count = self.integer()
         self.skip(4)
-        for i in range(primitive_count):
-            p = self.primitive()
-            self.mesh_data["primitives"].append(
-                {
-                    "material_index": p.mat_idx,
-                    "vertex_index_start": p.start,
-                    "vertex_index_count": p.end,
-                }
+        primitives = np.frombuffer(self.buffer, PRIMITIVE_DTYPE, primitive_count, self.offset)
+        if (primitives["material_index"] < 0).any():
+            raise ValueError(
+                f"Primitive has a negative material index: {primitives['material_index'].min()}"
             )
+        self._arrays["primitives"] = np.stack(
+            [primitives[field].astype(np.uint32) for field in PRIMITIVE_DTYPE.names], axis=1
+        )
+        self.skip(primitives.nbytes)
 
     def parse_meshpoints(self):
         meshpoint_count = self.integer()
         self.skip(4)
-        self.meshpoint_offset_start = self.offset
         for i in range(meshpoint_count):
             p = self.meshpoint()
-            self.mesh_data["meshpoints"].append(
+            self._meshpoints.append(
                 {
                     "name": p.name,
                     "position": p.pos,
@@ -105,31 +280,26 @@ class BinaryReader:
     def parse_materials(self):
         material_count = self.integer()
         self.skip(4)
-        self.materials_offset_start = self.offset
         for i in range(material_count):
             name_length = self.integer()
             name = self.string(name_length)
-            self.mesh_data["materials"].append(name)
+            self._materials.append(name)
 
     @staticmethod
     def initialize_from(mesh_file):
         reader = BinaryReader()
 
         with open(mesh_file, "rb") as f:
-            buffer = f.read()
-
-        reader.buffer = buffer
-        reader.string(4)  # header
-        reader.boolean()  # is_skinned
-        reader.bounding_box()
-        reader.bounding_sphere()
-        reader.skip(8)  # padding
-        reader.parse_vertices()
-        reader.parse_indices()
-        reader.parse_primitives()
-        reader.parse_meshpoints()
-        reader.parse_bones()
-        reader.parse_materials()
+            reader.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        reader.index_sections()
+        return reader
+
+    @staticmethod
+    def from_buffer(buffer):
+        reader = BinaryReader()
+        reader.buffer = bytes(buffer)
+        reader.index_sections()
         return reader
 
     def skip(self, amount):
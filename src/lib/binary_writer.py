@@ -0,0 +1,154 @@
+from struct import pack
+from .binary_reader import VERTEX_DTYPE, VERTEX_UV1_DTYPE, PRIMITIVE_DTYPE, PADDING_SIZE
+import numpy as np
+
+# not verified against a mesh from the game or meshbuilder yet, see tests/test_binary_writer.py.
+# Exports pass the header and padding of the mesh they replace instead whenever there is one
+MESH_HEADER = b"MESH"
+MESH_PADDING = bytes(PADDING_SIZE)
+
+
+class BinaryWriter:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def meshpoint(self, meshpoint):
+        name = meshpoint["name"].encode("utf-8")
+        self.integer(len(name))
+        self.string(name)
+        self.vector3f(meshpoint["position"])
+        self.matrix3(meshpoint["rotation"])
+        self.short(meshpoint["bone_index"])
+
+    def bounding_box(self, positions):
+        if len(positions):
+            self.vector3f(positions.min(axis=0))
+            self.vector3f(positions.max(axis=0))
+        else:
+            self.vector3f((0, 0, 0))
+            self.vector3f((0, 0, 0))
+
+    def bounding_sphere(self, positions):
+        if len(positions):
+            center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+            radius = np.linalg.norm(positions - center, axis=1).max()
+        else:
+            center, radius = (0, 0, 0), 0
+        self.vector3f(center)
+        self.float(radius)
+
+    def write_vertices(self, mesh_data):
+        positions = mesh_data["positions"]
+        has_uv1 = mesh_data.get("has_uv1")
+        if has_uv1 is None:
+            has_uv1 = np.full(len(positions), mesh_data.get("uv1") is not None)
+
+        vertices = np.zeros(len(positions), dtype=VERTEX_UV1_DTYPE)
+        vertices["p"] = positions
+        vertices["n"] = mesh_data["normals"]
+        vertices["t"] = mesh_data["tangents"]
+        vertices["uv0"] = mesh_data["uv0"]
+        vertices["has_uv1"] = has_uv1
+        if has_uv1.any():
+            vertices["uv1"] = mesh_data["uv1"]
+
+        self.count(len(vertices))
+        if has_uv1.all():
+            self.buffer += vertices.tobytes()
+        elif not has_uv1.any():
+            self.buffer += vertices[list(VERTEX_DTYPE.names)].astype(VERTEX_DTYPE).tobytes()
+        else:
+            # vertices without uv1 leave the trailing block out, so the record size differs
+            raw = vertices.view(np.uint8).reshape(len(vertices), VERTEX_UV1_DTYPE.itemsize)
+            sizes = np.where(has_uv1, VERTEX_UV1_DTYPE.itemsize, VERTEX_DTYPE.itemsize)
+            self.buffer += raw[np.arange(VERTEX_UV1_DTYPE.itemsize) < sizes[:, None]].tobytes()
+
+    def write_indices(self, mesh_data):
+        indices = np.asarray(mesh_data["indices"], dtype="<u4")
+        self.count(len(indices))
+        self.buffer += indices.tobytes()
+
+    def write_primitives(self, mesh_data):
+        primitives = np.asarray(mesh_data["primitives"]).reshape(-1, 3)
+        records = np.zeros(len(primitives), dtype=PRIMITIVE_DTYPE)
+        for i, field in enumerate(PRIMITIVE_DTYPE.names):
+            records[field] = primitives[:, i]
+        self.count(len(records))
+        self.buffer += records.tobytes()
+
+    def write_meshpoints(self, mesh_data):
+        self.count(len(mesh_data["meshpoints"]))
+        for meshpoint in mesh_data["meshpoints"]:
+            self.meshpoint(meshpoint)
+
+    def write_bones(self, mesh_data):
+        self.count(0)
+
+    def write_materials(self, mesh_data):
+        self.count(len(mesh_data["materials"]))
+        for material in mesh_data["materials"]:
+            name = material.encode("utf-8")
+            self.integer(len(name))
+            self.string(name)
+
+    def write_body(self, mesh_data):
+        self.write_vertices(mesh_data)
+        self.write_indices(mesh_data)
+        self.write_primitives(mesh_data)
+        self.write_meshpoints(mesh_data)
+        self.write_bones(mesh_data)
+        self.write_materials(mesh_data)
+
+    @staticmethod
+    def initialize_from(mesh_data, template=None):
+        """`template` holds the header and padding bytes, usually from `BinaryReader.header_template`"""
+        header, padding = template or (MESH_HEADER, MESH_PADDING)
+        writer = BinaryWriter()
+        positions = np.asarray(mesh_data["positions"], dtype=np.float32).reshape(-1, 3)
+
+        writer.string(header)
+        writer.boolean(False)  # is_skinned
+        writer.bounding_box(positions)
+        writer.bounding_sphere(positions)
+        writer.string(padding)
+        writer.write_body(mesh_data)
+        return writer
+
+    @staticmethod
+    def from_reader(reader):
+        """Writes back what the reader decoded, the header section is copied as it is"""
+        writer = BinaryWriter()
+        writer.buffer += reader.section_bytes("header")
+        writer.write_body(
+            dict(reader.arrays, meshpoints=reader.meshpoints, materials=reader.materials)
+        )
+        return writer
+
+    def skip(self, amount):
+        self.buffer += bytes(amount)
+
+    def count(self, value):
+        self.integer(value)
+        self.skip(4)
+
+    def matrix3(self, values):
+        for value in values:
+            self.float(value)
+
+    def short(self, value):
+        self.buffer += pack("h", value)
+
+    def boolean(self, value):
+        self.buffer += pack("?", bool(value))
+
+    def string(self, value):
+        self.buffer += pack(f"{len(value)}s", value)
+
+    def vector3f(self, values):
+        self.buffer += pack("3f", *values)
+
+    def integer(self, value):
+        self.buffer += pack("I", value)
+
+    def float(self, value):
+        self.buffer += pack("f", value)
@@ -0,0 +1,405 @@
+from struct import unpack_from
+import numpy as np
+
+DDS_MAGIC = b"DDS "
+DDPF_ALPHAPIXELS = 0x1
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDPF_LUMINANCE = 0x20000
+
+# block formats: (decoder name, bytes per 4x4 block)
+FOURCC_FORMATS = {
+    b"DXT1": ("bc1", 8),
+    b"DXT2": ("bc2", 16),
+    b"DXT3": ("bc2", 16),
+    b"DXT4": ("bc3", 16),
+    b"DXT5": ("bc3", 16),
+    b"ATI1": ("bc4", 8),
+    b"BC4U": ("bc4", 8),
+    b"ATI2": ("bc5", 16),
+    b"BC5U": ("bc5", 16),
+}
+DXGI_FORMATS = {
+    28: ("rgba", 4),
+    29: ("rgba", 4),
+    71: ("bc1", 8),
+    72: ("bc1", 8),
+    74: ("bc2", 16),
+    75: ("bc2", 16),
+    77: ("bc3", 16),
+    78: ("bc3", 16),
+    80: ("bc4", 8),
+    83: ("bc5", 16),
+    87: ("bgra", 4),
+    91: ("bgra", 4),
+    98: ("bc7", 16),
+    99: ("bc7", 16),
+}
+# decode this many blocks at a time to bound the memory of the intermediate arrays
+CHUNK_BLOCKS = 1 << 16
+
+# BC7 mode table: subsets, partition bits, rotation bits, index selection bits,
+# color bits, alpha bits, endpoint p-bits, shared p-bits, index bits, secondary index bits
+BC7_MODES = [
+    (3, 4, 0, 0, 4, 0, 1, 0, 3, 0),
+    (2, 6, 0, 0, 6, 0, 0, 1, 3, 0),
+    (3, 6, 0, 0, 5, 0, 0, 0, 2, 0),
+    (2, 6, 0, 0, 7, 0, 1, 0, 2, 0),
+    (1, 0, 2, 1, 5, 6, 0, 0, 2, 3),
+    (1, 0, 2, 0, 7, 8, 0, 0, 2, 2),
+    (1, 0, 0, 0, 7, 7, 1, 0, 4, 0),
+    (2, 6, 0, 0, 5, 5, 1, 0, 2, 0),
+]
+BC7_WEIGHTS = {
+    2: np.array([0, 21, 43, 64]),
+    3: np.array([0, 9, 18, 27, 37, 46, 55, 64]),
+    4: np.array([0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64]),
+}
+# fmt: off
+BC7_PARTITIONS_2 = [
+    0xCCCC, 0x8888, 0xEEEE, 0xECC8, 0xC880, 0xFEEC, 0xFEC8, 0xEC80,
+    0xC800, 0xFFEC, 0xFE80, 0xE800, 0xFFE8, 0xFF00, 0xFFF0, 0xF000,
+    0xF710, 0x008E, 0x7100, 0x08CE, 0x008C, 0x7310, 0x3100, 0x8CCE,
+    0x088C, 0x3110, 0x6666, 0x366C, 0x17E8, 0x0FF0, 0x718E, 0x399C,
+    0xAAAA, 0xF0F0, 0x5A5A, 0x33CC, 0x3C3C, 0x55AA, 0x9696, 0xA55A,
+    0x73CE, 0x13C8, 0x324C, 0x3BDC, 0x6996, 0xC33C, 0x9966, 0x0660,
+    0x0272, 0x04E4, 0x4E40, 0x2720, 0xC936, 0x936C, 0x39C6, 0x639C,
+    0x9336, 0x9CC6, 0x817E, 0xE718, 0xCCF0, 0x0FCC, 0x7744, 0xEE22,
+]
+BC7_PARTITIONS_3 = [
+    0xAA685050, 0x6A5A5040, 0x5A5A4200, 0x5450A0A8, 0xA5A50000, 0xA0A05050, 0x5555A0A0, 0x5A5A5050,
+    0xAA550000, 0xAA555500, 0xAAAA5500, 0x90909090, 0x94949494, 0xA4A4A4A4, 0xA9A59450, 0x2A0A4250,
+    0xA5945040, 0x0A425054, 0xA5A5A500, 0x55A0A0A0, 0xA8A85454, 0x6A6A4040, 0xA4A45000, 0x1A1A0500,
+    0x0050A4A4, 0xAAA59090, 0x14696914, 0x69691400, 0xA08585A0, 0xAA821414, 0x50A4A450, 0x6A5A0200,
+    0xA9A58000, 0x5090A0A8, 0xA8A09050, 0x24242424, 0x00AA5500, 0x24924924, 0x24499224, 0x50A50A50,
+    0x500AA550, 0xAAAA4444, 0x66660000, 0xA5A0A5A0, 0x50A050A0, 0x69286928, 0x44AAAA44, 0x66666600,
+    0xAA444444, 0x54A854A8, 0x95809580, 0x96969600, 0xA85454A8, 0x80959580, 0xAA141414, 0x96960000,
+    0xAAAA1414, 0xA05050A0, 0xA0A5A5A0, 0x96000000, 0x40804080, 0xA9A8A9A8, 0xAAAAAA44, 0x2A4A5254,
+]
+BC7_ANCHORS_2 = [
+    15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15,
+    15, 2, 8, 2, 2, 8, 8, 15, 2, 8, 2, 2, 8, 8, 2, 2,
+    15, 15, 6, 8, 2, 8, 15, 15, 2, 8, 2, 2, 2, 15, 15, 6,
+    6, 2, 6, 8, 15, 15, 2, 2, 15, 15, 15, 15, 15, 2, 2, 15,
+]
+BC7_ANCHORS_3A = [
+    3, 3, 15, 15, 8, 3, 15, 15, 8, 8, 6, 6, 6, 5, 3, 3,
+    3, 3, 8, 15, 3, 3, 6, 10, 5, 8, 8, 6, 8, 5, 15, 15,
+    8, 15, 3, 5, 6, 10, 8, 15, 15, 3, 15, 5, 15, 15, 15, 15,
+    3, 15, 5, 5, 5, 8, 5, 10, 5, 10, 8, 13, 15, 12, 3, 3,
+]
+BC7_ANCHORS_3B = [
+    15, 8, 8, 3, 15, 15, 3, 8, 15, 15, 15, 15, 15, 15, 15, 8,
+    15, 8, 15, 3, 15, 8, 15, 8, 3, 15, 6, 10, 15, 15, 10, 8,
+    15, 3, 15, 10, 10, 8, 9, 10, 6, 15, 8, 15, 3, 6, 6, 8,
+    15, 3, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 3, 15, 15, 8,
+]
+# fmt: on
+PIXELS = np.arange(16)
+# subset of every pixel per partition, indexed [subsets][partition, pixel]
+BC7_SUBSETS = {
+    1: np.zeros((64, 16), dtype=np.int64),
+    2: (np.array(BC7_PARTITIONS_2)[:, None] >> PIXELS) & 1,
+    3: (np.array(BC7_PARTITIONS_3)[:, None] >> (PIXELS * 2)) & 3,
+}
+# pixels whose index drops its most significant bit, indexed [subsets][partition, pixel]
+BC7_ANCHORS = {
+    1: PIXELS == 0,
+    2: (PIXELS == 0) | (PIXELS == np.array(BC7_ANCHORS_2)[:, None]),
+    3: (PIXELS == 0)
+    | (PIXELS == np.array(BC7_ANCHORS_3A)[:, None])
+    | (PIXELS == np.array(BC7_ANCHORS_3B)[:, None]),
+}
+
+
+def bits_at(bits, offset, width):
+    """Reads `width` bits per block starting at `offset`, least significant bit first"""
+    if width == 0:
+        return np.zeros(len(bits), dtype=np.int64)
+    return (bits[:, offset : offset + width].astype(np.int64) << np.arange(width)).sum(axis=1)
+
+
+def expand_bits(values, width):
+    return (values << (8 - width)) | (values >> (2 * width - 8))
+
+
+def decode_rgb565(colors):
+    r = expand_bits((colors >> 11) & 0x1F, 5)
+    g = expand_bits((colors >> 5) & 0x3F, 6)
+    b = expand_bits(colors & 0x1F, 5)
+    return np.stack((r, g, b), axis=-1)
+
+
+def decode_bc1(blocks, three_color=True):
+    colors = blocks[:, :4].copy().view("<u2").astype(np.int64)
+    c0, c1 = decode_rgb565(colors[:, 0]), decode_rgb565(colors[:, 1])
+
+    is_four_color = (colors[:, 0] > colors[:, 1])[:, None] | (not three_color)
+    palette = np.empty((len(blocks), 4, 4), dtype=np.int64)
+    palette[:, 0, :3] = c0
+    palette[:, 1, :3] = c1
+    palette[:, 2, :3] = np.where(is_four_color, (2 * c0 + c1) // 3, (c0 + c1) // 2)
+    palette[:, 3, :3] = np.where(is_four_color, (c0 + 2 * c1) // 3, 0)
+    palette[:, :, 3] = 255
+    palette[:, 3, 3] = np.where(is_four_color[:, 0], 255, 0)
+
+    indices = (blocks[:, 4:8].copy().view("<u4").astype(np.int64) >> (PIXELS * 2)) & 3
+    return np.take_along_axis(palette, indices[:, :, None], axis=1)
+
+
+def decode_bc4_channel(blocks):
+    e0, e1 = blocks[:, 0:1].astype(np.int64), blocks[:, 1:2].astype(np.int64)
+    steps = np.arange(1, 7)
+
+    palette = np.empty((len(blocks), 8), dtype=np.int64)
+    palette[:, 0:1], palette[:, 1:2] = e0, e1
+    eight = ((7 - steps) * e0 + steps * e1) // 7
+    six = ((5 - steps[:4]) * e0 + steps[:4] * e1) // 5
+    six = np.concatenate((six, np.zeros_like(e0), np.full_like(e0, 255)), axis=1)
+    palette[:, 2:] = np.where(e0 > e1, eight, six)
+
+    packed = (blocks[:, 2:8].astype(np.int64) << (np.arange(6) * 8)).sum(axis=1)
+    indices = (packed[:, None] >> (PIXELS * 3)) & 7
+    return np.take_along_axis(palette, indices, axis=1)
+
+
+def decode_bc2(blocks):
+    pixels = decode_bc1(blocks[:, 8:], three_color=False)
+    alpha = (
+        blocks[:, :8].copy().view("<u8").astype(np.uint64) >> (PIXELS * 4).astype(np.uint64)
+    ) & 0xF
+    pixels[:, :, 3] = alpha.astype(np.int64) * 17
+    return pixels
+
+
+def decode_bc3(blocks):
+    pixels = decode_bc1(blocks[:, 8:], three_color=False)
+    pixels[:, :, 3] = decode_bc4_channel(blocks[:, :8])
+    return pixels
+
+
+def decode_bc4(blocks):
+    red = decode_bc4_channel(blocks)
+    pixels = np.empty((len(blocks), 16, 4), dtype=np.int64)
+    pixels[:, :, :3] = red[:, :, None]
+    pixels[:, :, 3] = 255
+    return pixels
+
+
+def decode_bc5(blocks):
+    pixels = np.zeros((len(blocks), 16, 4), dtype=np.int64)
+    pixels[:, :, 0] = decode_bc4_channel(blocks[:, :8])
+    pixels[:, :, 1] = decode_bc4_channel(blocks[:, 8:])
+    pixels[:, :, 3] = 255
+    return pixels
+
+
+def bc7_indices(bits, offset, index_bits, anchors):
+    """Reads 16 indices per block, anchor pixels being stored with one bit less"""
+    widths = index_bits - anchors
+    offsets = offset + np.cumsum(widths, axis=1) - widths
+    indices = np.zeros(widths.shape, dtype=np.int64)
+    rows = np.arange(len(bits))[:, None]
+    for bit in range(index_bits):
+        values = bits[rows, np.minimum(offsets + bit, 127)].astype(np.int64)
+        indices |= np.where(bit < widths, values, 0) << bit
+    return indices
+
+
+def decode_bc7_mode(bits, mode):
+    subsets, partition_bits, rotation_bits, selection_bits = BC7_MODES[mode][:4]
+    color_bits, alpha_bits, endpoint_pbits, shared_pbits = BC7_MODES[mode][4:8]
+    index_bits, index2_bits = BC7_MODES[mode][8:]
+
+    offset = mode + 1
+    partition = bits_at(bits, offset, partition_bits)
+    offset += partition_bits
+    rotation = bits_at(bits, offset, rotation_bits)
+    offset += rotation_bits
+    selection = bits_at(bits, offset, selection_bits)
+    offset += selection_bits
+
+    endpoints = np.zeros((len(bits), subsets * 2, 4), dtype=np.int64)
+    channels = 4 if alpha_bits else 3
+    for channel in range(channels):
+        width = alpha_bits if channel == 3 else color_bits
+        for endpoint in range(subsets * 2):
+            endpoints[:, endpoint, channel] = bits_at(bits, offset, width)
+            offset += width
+
+    if endpoint_pbits or shared_pbits:
+        for endpoint in range(subsets * 2):
+            if endpoint_pbits or endpoint % 2 == 0:
+                pbit = bits_at(bits, offset, 1)
+                offset += 1
+            endpoints[:, endpoint, :channels] = (endpoints[:, endpoint, :channels] << 1) | pbit[
+                :, None
+            ]
+        color_bits += 1
+        alpha_bits += 1 if alpha_bits else 0
+
+    endpoints[:, :, :3] = expand_bits(endpoints[:, :, :3], color_bits)
+    endpoints[:, :, 3] = expand_bits(endpoints[:, :, 3], alpha_bits) if alpha_bits else 255
+
+    anchors = BC7_ANCHORS[subsets][partition] if subsets > 1 else BC7_ANCHORS[1][None]
+    indices = bc7_indices(bits, offset, index_bits, np.broadcast_to(anchors, (len(bits), 16)))
+    offset += 16 * index_bits - subsets
+    color_weights = alpha_weights = BC7_WEIGHTS[index_bits][indices]
+    if index2_bits:
+        # modes 4 and 5 store separate indices for alpha, the selection bit swaps their roles
+        indices2 = bc7_indices(
+            bits, offset, index2_bits, np.broadcast_to(BC7_ANCHORS[1], (len(bits), 16))
+        )
+        weights2 = BC7_WEIGHTS[index2_bits][indices2]
+        swap = (selection == 1)[:, None]
+        color_weights = np.where(swap, weights2, alpha_weights)
+        alpha_weights = np.where(swap, alpha_weights, weights2)
+
+    subset = BC7_SUBSETS[subsets][partition] * 2
+    e0 = np.take_along_axis(endpoints, subset[:, :, None], axis=1)
+    e1 = np.take_along_axis(endpoints, subset[:, :, None] + 1, axis=1)
+    weights = np.concatenate(
+        (np.repeat(color_weights[:, :, None], 3, axis=2), alpha_weights[:, :, None]), axis=2
+    )
+    pixels = ((64 - weights) * e0 + weights * e1 + 32) >> 6
+
+    if rotation_bits:
+        for channel in range(3):
+            rotated = rotation == channel + 1
+            pixels[rotated, :, channel], pixels[rotated, :, 3] = (
+                pixels[rotated, :, 3],
+                pixels[rotated, :, channel].copy(),
+            )
+    return pixels
+
+
+def decode_bc7(blocks):
+    bits = np.unpackbits(blocks, axis=1, bitorder="little")
+    # the mode is the position of the lowest set bit, blocks without one decode to zero
+    modes = np.where(bits[:, :8].any(axis=1), np.argmax(bits[:, :8], axis=1), 8)
+
+    pixels = np.zeros((len(blocks), 16, 4), dtype=np.int64)
+    for mode in np.unique(modes):
+        if mode < 8:
+            pixels[modes == mode] = decode_bc7_mode(bits[modes == mode], mode)
+    return pixels
+
+
+BLOCK_DECODERS = {
+    "bc1": decode_bc1,
+    "bc2": decode_bc2,
+    "bc3": decode_bc3,
+    "bc4": decode_bc4,
+    "bc5": decode_bc5,
+    "bc7": decode_bc7,
+}
+
+
+class DDSReader:
+    """Decodes DDS textures into RGBA8 pixels with NumPy, without texconv or bpy"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.width = 0
+        self.height = 0
+        self.mip_count = 1
+        self.format = None
+        self.block_size = 0
+        self.masks = None
+        self.data_offset = 0
+
+    def parse_header(self):
+        if self.buffer[:4] != DDS_MAGIC:
+            raise ValueError("Not a DDS file")
+
+        self.height, self.width = unpack_from("<2I", self.buffer, 12)
+        self.mip_count = max(1, unpack_from("<I", self.buffer, 28)[0])
+        pf_flags, fourcc, bit_count = unpack_from("<I4sI", self.buffer, 80)
+        self.data_offset = 128
+
+        if pf_flags & DDPF_FOURCC and fourcc == b"DX10":
+            dxgi_format = unpack_from("<I", self.buffer, 128)[0]
+            self.data_offset += 20
+            if dxgi_format not in DXGI_FORMATS:
+                raise ValueError(f"Unsupported DXGI format: {dxgi_format}")
+            self.format, self.block_size = DXGI_FORMATS[dxgi_format]
+        elif pf_flags & DDPF_FOURCC:
+            if fourcc not in FOURCC_FORMATS:
+                raise ValueError(f"Unsupported FourCC: {fourcc}")
+            self.format, self.block_size = FOURCC_FORMATS[fourcc]
+        elif pf_flags & (DDPF_RGB | DDPF_LUMINANCE) and bit_count in (8, 16, 24, 32):
+            self.format, self.block_size = "masked", bit_count // 8
+            masks = unpack_from("<4I", self.buffer, 92)
+            has_alpha = pf_flags & DDPF_ALPHAPIXELS
+            self.masks = masks if has_alpha else masks[:3] + (0,)
+        else:
+            raise ValueError("Unsupported DDS pixel format")
+
+    def is_compressed(self):
+        return self.format in BLOCK_DECODERS
+
+    def mip_size(self, level):
+        width, height = max(1, self.width >> level), max(1, self.height >> level)
+        return width, height
+
+    def mip_offset(self, level):
+        offset = self.data_offset
+        for i in range(level):
+            width, height = self.mip_size(i)
+            if self.is_compressed():
+                offset += ((width + 3) // 4) * ((height + 3) // 4) * self.block_size
+            else:
+                offset += width * height * self.block_size
+        return offset
+
+    def decode_blocks(self, data, width, height):
+        blocks_x, blocks_y = (width + 3) // 4, (height + 3) // 4
+        blocks = np.frombuffer(data, dtype=np.uint8, count=blocks_x * blocks_y * self.block_size)
+        blocks = blocks.reshape(-1, self.block_size)
+
+        decoder = BLOCK_DECODERS[self.format]
+        pixels = np.empty((len(blocks), 16, 4), dtype=np.uint8)
+        for start in range(0, len(blocks), CHUNK_BLOCKS):
+            pixels[start : start + CHUNK_BLOCKS] = decoder(blocks[start : start + CHUNK_BLOCKS])
+
+        # (block row, block column, pixel row, pixel column) -> image rows and columns
+        pixels = pixels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+        return pixels.reshape(blocks_y * 4, blocks_x * 4, 4)[:height, :width]
+
+    def decode_uncompressed(self, data, width, height):
+        count = width * height
+        if self.format == "masked":
+            raw = np.frombuffer(data, dtype=np.uint8, count=count * self.block_size)
+            raw = raw.reshape(count, self.block_size).astype(np.uint32)
+            values = (raw << (np.arange(self.block_size, dtype=np.uint32) * 8)).sum(axis=1)
+            pixels = np.full((count, 4), 255, dtype=np.uint8)
+            for channel, mask in enumerate(self.masks):
+                if not mask:
+                    continue
+                shift = (mask & -mask).bit_length() - 1
+                channel_max = mask >> shift
+                pixels[:, channel] = ((values & mask) >> shift) * 255 // channel_max
+            if self.masks[1] == 0 and self.masks[2] == 0:
+                # luminance formats only define the red mask
+                pixels[:, 1] = pixels[:, 2] = pixels[:, 0]
+        else:
+            pixels = np.frombuffer(data, dtype=np.uint8, count=count * 4).reshape(count, 4)
+            if self.format == "bgra":
+                pixels = pixels[:, [2, 1, 0, 3]]
+        return pixels.reshape(height, width, 4)
+
+    def mip(self, level=0):
+        """Returns the pixels of a mip level as a (height, width, 4) uint8 array, top row first"""
+        level = min(level, self.mip_count - 1)
+        width, height = self.mip_size(level)
+        data = memoryview(self.buffer)[self.mip_offset(level) :]
+        if self.is_compressed():
+            return self.decode_blocks(data, width, height)
+        return self.decode_uncompressed(data, width, height)
+
+    @staticmethod
+    def initialize_from(texture_file):
+        with open(texture_file, "rb") as f:
+            reader = DDSReader(f.read())
+        reader.parse_header()
+        return reader
@@ -0,0 +1,82 @@
+import hashlib, json, os
+import numpy as np
+from .helpers.filesystem import write_atomically
+
+# bump whenever the hashed inputs change so older records never match
+MANIFEST_VERSION = 1
+ARRAY_KEYS = ["positions", "normals", "tangents", "uv0", "uv1", "indices", "primitives"]
+
+
+def get_export_hash(export_data, options):
+    """Hash of everything that ends up in the exported mesh, plus the options it was exported with"""
+    digest = hashlib.sha256(f"v{MANIFEST_VERSION}".encode("utf-8"))
+    for key in ARRAY_KEYS:
+        digest.update(key.encode("utf-8"))
+        if export_data[key] is not None:
+            digest.update(np.ascontiguousarray(export_data[key]).tobytes())
+    digest.update(
+        json.dumps(
+            [export_data["meshpoints"], export_data["materials"], options], sort_keys=True
+        ).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+class ExportManifest:
+    """Remembers what each exported .mesh was built from, so unchanged exports can be skipped"""
+
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self.outputs = None
+        self.recorded = {}
+        self.is_dirty = False
+
+    def output(self, mesh_file):
+        return os.path.normcase(os.path.abspath(mesh_file))
+
+    def load(self):
+        if self.outputs is None:
+            try:
+                with open(self.manifest_file, "r") as f:
+                    manifest = json.load(f)
+                self.outputs = (
+                    manifest["outputs"] if manifest["version"] == MANIFEST_VERSION else {}
+                )
+            except (OSError, KeyError, json.JSONDecodeError):
+                self.outputs = {}
+        return self.outputs
+
+    def save(self):
+        """Writes the records since the last save, call once per export"""
+        if not self.is_dirty:
+            return
+        # merge with the records of other Blender instances exporting meanwhile
+        self.outputs = None
+        self.outputs = dict(self.load(), **self.recorded)
+
+        manifest = {"version": MANIFEST_VERSION, "outputs": self.outputs}
+        try:
+            write_atomically(self.manifest_file, json.dumps(manifest, indent=4).encode("utf-8"))
+            self.is_dirty = False
+        except OSError as e:
+            print(f"ExportManifest.save() could not write manifest: {e}")
+
+    def is_current(self, mesh_file, export_hash):
+        """True when the mesh was last exported from the same inputs and hasn't been touched since"""
+        record = self.load().get(self.output(mesh_file))
+        if record is None or record["hash"] != export_hash:
+            return False
+        try:
+            stat = os.stat(mesh_file)
+        except OSError:
+            return False
+        return record["mtime"] == stat.st_mtime and record["size"] == stat.st_size
+
+    def record(self, mesh_file, export_hash):
+        stat = os.stat(mesh_file)
+        self.recorded[self.output(mesh_file)] = {
+            "hash": export_hash,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+        }
+        self.is_dirty = True
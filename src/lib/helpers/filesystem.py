@@ -1,4 +1,4 @@
-import os
+import os, tempfile
 
 
 def normalize(file_path, args):
@@ -11,3 +11,70 @@ def rename(path, dest, filename):
 
 def basename(filename):
     return os.path.basename(os.path.splitext(filename)[0])
+
+
+def write_if_changed(file_path, contents):
+    """Leaves identical files untouched so file watchers don't pick up a rewrite, returns if written"""
+    try:
+        if os.path.getsize(file_path) == len(contents):
+            with open(file_path, "rb") as f:
+                if f.read() == contents:
+                    return False
+    except OSError:
+        pass
+    with open(file_path, "wb") as f:
+        f.write(contents)
+    return True
+
+
+def write_atomically(file_path, data):
+    """Writes to a temporary file next to the target first, so readers never see a partial file.
+    `data` is bytes, or a function writing to the open binary file"""
+    folder = os.path.dirname(file_path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if callable(data):
+                data(f)
+            else:
+                f.write(data)
+        os.replace(tmp, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def touch(file_path):
+    """Marks a cache entry as recently used for `evict_lru`"""
+    try:
+        os.utime(file_path)
+    except OSError:
+        pass
+
+
+def evict_lru(folder, suffix, max_bytes):
+    """Removes the least recently modified files ending with `suffix` until the folder's total stays
+    within `max_bytes`"""
+    entries = []
+    for file in os.listdir(folder):
+        if not file.endswith(suffix):
+            continue
+        try:
+            stat = os.stat(os.path.join(folder, file))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, file))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, file in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(folder, file))
+            total_size -= size
+        except OSError:
+            pass
@@ -8,7 +8,8 @@ from ....constants import (
 )
 from .filesystem import normalize, rename
 from .mesh import MeshMaterial, ShieldEffect
-import bpy, os, json, re, subprocess
+import bpy, bmesh, os, json, re, subprocess
+import numpy as np
 
 
 class MeshException(Exception):
@@ -50,16 +51,15 @@ def get_bounding_box(mesh):
         return bounding_sphere_radius, extents, center
 
 
+def get_material_counts(data, slot_count):
+    slots = np.empty(len(data.polygons), dtype=np.int32)
+    data.polygons.foreach_get("material_index", slots)
+    return np.bincount(np.clip(slots, 0, None), minlength=slot_count)
+
+
 def get_unused_materials(mesh, materials):
-    unused_mats = []
-    for i, mat in enumerate(materials):
-        tris = []
-        for tri in mesh.data.polygons:
-            if tri.material_index == i:
-                tris.append(tri.material_index)
-        if len(tris) == 0:
-            unused_mats.append(mat)
-    return unused_mats
+    counts = get_material_counts(mesh.data, len(materials))
+    return [mat for i, mat in enumerate(materials) if counts[i] == 0]
 
 
 def frozen(mesh):
@@ -74,17 +74,6 @@ def frozen(mesh):
     return True
 
 
-def apply_meshpoint_transforms(mesh):
-    transforms = []
-    if len(mesh.children) >= 1:
-        for empty in mesh.children:
-            if empty is None and not empty.type == "EMPTY":
-                continue
-            transforms.append(empty.matrix_world.copy())
-            empty.matrix_local = empty.matrix_basis @ MESHPOINT_MATRIX
-    return transforms
-
-
 def apply_transforms(mesh):
     if not frozen(mesh):
         bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
@@ -146,73 +135,375 @@ def create_and_move_mesh_materials(file_path, mesh):
         rename(path=file_path, dest=dest, filename=material_name)
 
 
-def restore_mesh_transforms(transforms, meshes):
-    for i, mesh in enumerate(meshes):
-        mt, mpt = transforms[i]
-        mesh.matrix_world = mt
-        restore_meshpoint_transforms(children=mesh.children, original=mpt)
+def to_game_space(vectors):
+    # inverse of the import swizzle: blender (x, y, z) -> game (-x, z, -y)
+    return np.stack((-vectors[:, 0], vectors[:, 2], -vectors[:, 1]), axis=1)
 
 
-def restore_meshpoint_transforms(children, original):
-    if children and len(children) >= 1:
-        for i, empty in enumerate(children):
-            empty.matrix_local = original[i]
+def get_meshpoint_export_data(mesh):
+    meshpoints = []
+    for empty in mesh.children:
+        if empty.type != "EMPTY" or empty.hide_get():
+            continue
+        position = to_game_space(np.array([empty.matrix_world.translation]))[0]
+        # inverse of the rotation layout used on import
+        r = np.array(empty.matrix_world.to_3x3().normalized())
+        rotation = r[[0, 2, 1, 0, 2, 1, 0, 2, 1], [0, 0, 0, 1, 1, 1, 2, 2, 2]]
+        rotation *= [1, -1, 1, 1, 1, 1, 1, 1, -1]
+        meshpoints.append(
+            {
+                "name": re.sub(r"\b-\d+\b", "", empty.name),
+                "position": position.tolist(),
+                "rotation": rotation.tolist(),
+                "bone_index": -1,
+            }
+        )
+    return meshpoints
+
+
+def get_evaluated_mesh(mesh, depsgraph):
+    """Triangulated copy of the mesh with its modifiers applied, the caller has to remove it"""
+    data = bpy.data.meshes.new_from_object(
+        mesh.evaluated_get(depsgraph), preserve_all_data_layers=True, depsgraph=depsgraph
+    )
+    bm = bmesh.new()
+    bm.from_mesh(data)
+    bmesh.ops.triangulate(bm, faces=bm.faces)
+    bm.to_mesh(data)
+    bm.free()
+    return data
+
+
+def get_material_parts(mesh, data):
+    """World space meshes holding the triangles of each used material slot of a triangulated copy"""
+    loop_count = len(data.loops)
+    vertex_index = np.empty(loop_count, dtype=np.int32)
+    data.loops.foreach_get("vertex_index", vertex_index)
+    co = np.empty(len(data.vertices) * 3, dtype=np.float32)
+    data.vertices.foreach_get("co", co)
+    normals = np.empty(loop_count * 3, dtype=np.float32)
+    data.corner_normals.foreach_get("vector", normals)
+    uvs = []
+    for uv_layer in data.uv_layers:
+        uv = np.empty(loop_count * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uv)
+        uvs.append((uv_layer.name, uv.reshape(-1, 2)))
+    slots = np.empty(len(data.polygons), dtype=np.int32)
+    data.polygons.foreach_get("material_index", slots)
+    slots = np.clip(slots, 0, max(len(data.materials) - 1, 0))
+
+    matrix = np.array(mesh.matrix_world, dtype=np.float64)
+    rotation = matrix[:3, :3]
+    co = co.reshape(-1, 3) @ rotation.T + matrix[:3, 3]
+    normals = normals.reshape(-1, 3) @ np.linalg.inv(rotation)
+    normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+
+    triangles = np.arange(loop_count, dtype=np.int32).reshape(-1, 3)
+    # a mirroring transform turns the faces inside out unless the winding is flipped
+    if np.linalg.det(rotation) < 0:
+        triangles = triangles[:, [0, 2, 1]]
+
+    parts = []
+    try:
+        for slot in np.unique(slots):
+            loops = triangles[slots == slot].ravel()
+            used, loop_vertices = np.unique(vertex_index[loops], return_inverse=True)
+
+            part = bpy.data.meshes.new(data.name)
+            parts.append(part)
+            part.vertices.add(len(used))
+            part.vertices.foreach_set("co", co[used].ravel())
+            part.loops.add(len(loops))
+            part.loops.foreach_set("vertex_index", loop_vertices.astype(np.int32))
+            part.polygons.add(len(loops) // 3)
+            part.polygons.foreach_set("loop_start", np.arange(0, len(loops), 3, dtype=np.int32))
+            part.update(calc_edges=True)
+
+            for name, uv in uvs:
+                part.uv_layers.new(name=name).data.foreach_set("uv", uv[loops].ravel())
+            part.materials.append(data.materials[slot] if len(data.materials) else None)
+            part.polygons.foreach_set("use_smooth", np.ones(len(part.polygons), dtype=bool))
+            part.normals_split_custom_set(normals[loops])
+    except Exception:
+        # no object uses the parts yet, they would be left behind as orphans
+        for part in parts:
+            bpy.data.meshes.remove(part)
+        raise
+    return parts
+
+
+def create_export_objects(meshes, collection, depsgraph):
+    """Game space copies of the meshes split by material, with the glTF node names they stand in for"""
+    objects, names = [], {}
+    for mesh in meshes:
+        data = get_evaluated_mesh(mesh, depsgraph)
+        try:
+            parts = get_material_parts(mesh, data)
+        finally:
+            bpy.data.meshes.remove(data)
+
+        parent = None
+        for i, part in enumerate(parts):
+            obj = bpy.data.objects.new(f"{mesh.name}.export", part)
+            collection.objects.link(obj)
+            obj.matrix_world = GAME_MATRIX
+            names[obj.name] = mesh.name if i == 0 else f"{mesh.name}.{i:03d}"
+            objects.append(obj)
+            parent = parent or obj
+
+        for empty in mesh.children:
+            if empty.type != "EMPTY" or empty.hide_get() or parent is None:
+                continue
+            obj = bpy.data.objects.new(f"{empty.name}.export", None)
+            collection.objects.link(obj)
+            obj.parent = parent
+            obj.matrix_basis = empty.matrix_world @ MESHPOINT_MATRIX
+            names[obj.name] = empty.name
+            objects.append(obj)
+
+    return objects, names
+
+
+def get_corner_export_data(mesh, data, material_indices, has_uv1):
+    loop_count = len(data.loops)
+    vertex_index = np.empty(loop_count, dtype=np.int32)
+    data.loops.foreach_get("vertex_index", vertex_index)
+    co = np.empty(len(data.vertices) * 3, dtype=np.float32)
+    data.vertices.foreach_get("co", co)
+    normals = np.empty(loop_count * 3, dtype=np.float32)
+    data.corner_normals.foreach_get("vector", normals)
+
+    uvs = []
+    for uv_layer in data.uv_layers[: 2 if has_uv1 else 1]:
+        uv = np.empty(loop_count * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uv)
+        uv = uv.reshape(-1, 2)
+        uv[:, 1] = 1 - uv[:, 1]
+        uvs.append(uv)
+
+    if not data.uv_layers:
+        raise MeshException("ERROR", "The mesh is missing UV Coordinates.")
+    data.calc_tangents(uvmap=data.uv_layers[0].name)
+    tangents = np.empty(loop_count * 3, dtype=np.float32)
+    data.loops.foreach_get("tangent", tangents)
+    bitangent_signs = np.empty(loop_count, dtype=np.float32)
+    data.loops.foreach_get("bitangent_sign", bitangent_signs)
+    data.free_tangents()
+
+    slots = np.empty(len(data.polygons), dtype=np.int32)
+    data.polygons.foreach_get("material_index", slots)
+    slots = np.clip(slots, 0, max(len(material_indices) - 1, 0))
+    if len(material_indices) == 0 or (material_indices[slots] < 0).any():
+        raise MeshException("ERROR", f"Primitive has no material. mesh={mesh.name}")
+
+    matrix = np.array(mesh.matrix_world, dtype=np.float64)
+    rotation = matrix[:3, :3]
+    positions = co.reshape(-1, 3)[vertex_index] @ rotation.T + matrix[:3, 3]
+    normals = normals.reshape(-1, 3) @ np.linalg.inv(rotation)
+    tangents = tangents.reshape(-1, 3) @ rotation.T
+    normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+    tangents /= np.maximum(np.linalg.norm(tangents, axis=1), 1e-12)[:, None]
+
+    corners = np.hstack(
+        [
+            to_game_space(positions),
+            to_game_space(normals),
+            to_game_space(tangents),
+            bitangent_signs[:, None],
+            *uvs,
+        ]
+    ).astype(np.float32)
+
+    # the game space swizzle mirrors the mesh, flip the winding unless the object already does
+    if np.linalg.det(rotation) > 0:
+        corners = corners.reshape(-1, 3, corners.shape[1])[:, [0, 2, 1]].reshape(loop_count, -1)
 
+    return corners, material_indices[slots]
 
-def get_original_transforms(mesh):
-    original_transform = mesh.matrix_world.copy()
-    mesh.matrix_world = GAME_MATRIX @ mesh.matrix_world
-    original_meshpoint_transforms = apply_meshpoint_transforms(mesh=mesh)
-    return original_transform, original_meshpoint_transforms
 
+def get_mesh_export_data(meshes):
+    materials = sorted({mat for mesh in meshes for mat in get_avaliable_sorted_materials(mesh)})
+    has_uv1 = all(len(mesh.data.uv_layers) > 1 for mesh in meshes)
+    corners, triangle_materials, meshpoints = [], [], []
+    depsgraph = bpy.context.evaluated_depsgraph_get()
 
-def join_meshes(meshes):
-    mesh_groups = {}
     for mesh in meshes:
-        base = re.sub(r"\.\d+$", "", mesh.name)
-        mesh_groups.setdefault(base, []).append(mesh)
+        material_indices = np.array(
+            [
+                materials.index(mat.name.lower()) if mat and mat.name.lower() in materials else -1
+                for mat in mesh.data.materials
+            ],
+            dtype=np.int32,
+        )
+        data = get_evaluated_mesh(mesh, depsgraph)
+        try:
+            mesh_corners, mesh_materials = get_corner_export_data(
+                mesh, data, material_indices, has_uv1
+            )
+        finally:
+            bpy.data.meshes.remove(data)
+        corners.append(mesh_corners)
+        triangle_materials.append(mesh_materials)
+        meshpoints.extend(get_meshpoint_export_data(mesh))
+
+    corners = np.concatenate(corners)
+    triangle_materials = np.concatenate(triangle_materials)
+
+    # group triangles by material so every material is a single primitive
+    order = np.argsort(triangle_materials, kind="stable")
+    triangle_materials = triangle_materials[order]
+    corners = corners.reshape(-1, 3, corners.shape[1])[order].reshape(len(corners), -1)
+
+    # merge identical corners into shared vertices, keeping first-seen order
+    records = np.ascontiguousarray(corners).view(
+        np.dtype((np.void, corners.dtype.itemsize * corners.shape[1]))
+    )[:, 0]
+    _, first, inverse = np.unique(records, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    vertices = corners[first[order]]
+    indices = remap[inverse.ravel()].astype(np.uint32)
+
+    mat_indices, starts, counts = np.unique(
+        triangle_materials, return_index=True, return_counts=True
+    )
+    primitives = np.stack([mat_indices, starts * 3, counts * 3], axis=1).astype(np.uint32)
+
+    return {
+        "positions": vertices[:, 0:3],
+        "normals": vertices[:, 3:6],
+        "tangents": vertices[:, 6:10],
+        "uv0": vertices[:, 10:12],
+        "uv1": vertices[:, 12:14] if has_uv1 else None,
+        "indices": indices,
+        "primitives": primitives,
+        "meshpoints": meshpoints,
+        "materials": materials,
+    }
 
-    output = []
-    last_parent = None
 
-    for base, meshes in mesh_groups.items():
-        if len(meshes) == 1:
-            output.append(meshes[0])
-            last_parent = meshes[0]
-            continue
+def purge_orphans():
+    bpy.ops.outliner.orphans_purge()
 
-        parent = next((mesh for mesh in meshes if mesh.name == base), meshes[0])
-        last_parent = parent
-        bpy.ops.object.select_all(action="DESELECT")
 
-        for mesh in meshes:
-            mesh.select_set(True)
+def get_invalid_meshpoint_names(names, rules):
+    return [name for name in names if not any(re.match(regex, name) for regex in rules.values())]
 
-        bpy.context.view_layer.objects.active = parent
-        bpy.ops.object.join()
-        output.append(parent)
 
-    return last_parent
+def format_elements(indices, limit=10):
+    elements = ", ".join(str(i) for i in indices[:limit])
+    return f"{elements}, ... ({len(indices)} total)" if len(indices) > limit else elements
 
 
-def purge_orphans():
-    bpy.ops.outliner.orphans_purge()
+def get_meshpoint_problems(names, rules):
+    problems = []
+    invalid_meshpoints = get_invalid_meshpoint_names(names, rules)
+    if invalid_meshpoints:
+        problems.append(f'Invalid meshpoint names: [ {", ".join(invalid_meshpoints)} ]')
+
+    # blender suffixes copied objects, the game would see them as separate meshpoints
+    groups = {}
+    for name in names:
+        groups.setdefault(re.sub(r"\.\d{3}$", "", re.sub(r"\b-\d+\b", "", name)), []).append(name)
+    duplicates = [
+        name
+        for group in groups.values()
+        if len(group) > 1
+        for name in group
+        if re.match(r"^(.*)\.\d{3}$", name)
+    ]
+    if duplicates:
+        problems.append(
+            f'Duplicate meshpoint names, use a "-1" suffix instead: [ {", ".join(duplicates)} ]'
+        )
+    return problems
 
 
-def make_meshpoint_rules(mesh, rules):
-    invalid_meshpoints = []
+def get_export_problems(meshes, depsgraph, rules=None):
+    """Checks what the exporters would reject in a single pass over the evaluated meshes, without
+    writing anything. Returns the errors, which block the export, and the warnings"""
+    errors, warnings, meshpoint_names, hidden_meshpoints = [], [], [], []
 
-    for meshpoint in mesh.children:
-        name = meshpoint.name
-        is_matched = False
+    for mesh in meshes:
+        data = mesh.evaluated_get(depsgraph).data
+
+        if not data.uv_layers:
+            errors.append(f'"{mesh.name}" is missing UV Coordinates')
+
+        materials = list(data.materials)
+        empty_slots = [i for i, material in enumerate(materials) if material is None]
+        if len(empty_slots) == len(materials):
+            errors.append(f'Cannot export "{mesh.name}" without any materials')
+        elif empty_slots:
+            errors.append(
+                f'"{mesh.name}" has empty material slots: [ {format_elements(empty_slots)} ]'
+            )
+
+        co = np.empty(len(data.vertices) * 3, dtype=np.float32)
+        data.vertices.foreach_get("co", co)
+        co = co.reshape(-1, 3)
+        invalid_vertices = np.flatnonzero(~np.isfinite(co).all(axis=1))
+        if len(invalid_vertices):
+            errors.append(
+                f'"{mesh.name}" has NaN or infinite vertices: [ {format_elements(invalid_vertices)} ]'
+            )
+
+        triangles = np.empty(len(data.loop_triangles) * 3, dtype=np.int32)
+        data.loop_triangles.foreach_get("vertices", triangles)
+        triangles = triangles.reshape(-1, 3)
+        polygons = np.empty(len(data.loop_triangles), dtype=np.int32)
+        data.loop_triangles.foreach_get("polygon_index", polygons)
+        a, b, c = (co[triangles[:, i]].astype(np.float64) for i in range(3))
+        with np.errstate(invalid="ignore"):
+            is_degenerate = np.linalg.norm(np.cross(b - a, c - a), axis=1) <= 1e-12
+        degenerate_faces = np.unique(polygons[is_degenerate])
+        if len(degenerate_faces):
+            warnings.append(
+                f'"{mesh.name}" has zero-area faces: [ {format_elements(degenerate_faces)} ]'
+            )
+
+        counts = get_material_counts(data, len(materials))
+        unused_slots = [
+            i for i, material in enumerate(materials) if material is not None and counts[i] == 0
+        ]
+        if unused_slots:
+            warnings.append(
+                f'"{mesh.name}" has unused material slots: [ {format_elements(unused_slots)} ]'
+            )
 
-        for regex in rules.values():
-            if re.match(regex, name):
-                is_matched = True
-                break
+        for empty in mesh.children:
+            if empty.type == "EMPTY":
+                (hidden_meshpoints if empty.hide_get() else meshpoint_names).append(empty.name)
 
-        if not is_matched:
-            invalid_meshpoints.append(name)
+    if hidden_meshpoints:
+        warnings.append(f'Hidden meshpoints are not exported: [ {", ".join(hidden_meshpoints)} ]')
+    if rules is not None:
+        errors.extend(get_meshpoint_problems(meshpoint_names, rules))
+    return errors, warnings
+
+
+def sanitize_rebellion_meshpoints(file_path, rules, malformed=()):
+    """Renames every meshpoint of a Sins 1 text mesh that meshbuilder would reject in one rewrite"""
+    with open(file_path, "r+") as f:
+        lines = f.readlines()
+        meshpoints = {}
+        for i, line in enumerate(lines):
+            match = re.match(r'\s*DataString\s+"(.*)"', line)
+            if match:
+                meshpoints.setdefault(match.group(1), []).append(i)
+
+        invalid_meshpoints = get_invalid_meshpoint_names(meshpoints, rules) if rules else []
+        invalid_meshpoints += [name for name in malformed if name not in invalid_meshpoints]
+        for name in invalid_meshpoints:
+            print(f"invalid mesh point: '{name}', renaming...")
+            for i in meshpoints.get(name, []):
+                lines[i] = lines[i].replace(f'"{name}"', f'"Flair-{name}-remove_flair_prefix"')
+
+        if invalid_meshpoints:
+            f.seek(0)
+            f.truncate()
+            f.writelines(lines)
 
     return invalid_meshpoints
 
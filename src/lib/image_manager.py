@@ -0,0 +1,82 @@
+import bpy
+import time
+
+# images referenced within this many seconds are never unloaded, even over budget
+MIN_IDLE_SECONDS = 60
+
+
+class ImageManager:
+    """Keeps the pixels of imported Sins textures under a memory budget, least recently used first"""
+
+    def __init__(self, budget_mb=2048):
+        self.budget = budget_mb * 1024 * 1024
+        self.last_used = {}
+
+    def is_managed(self, image):
+        return image.get("sins2_source") is not None
+
+    def is_loaded(self, image):
+        if image.source == "FILE":
+            return image.has_data
+        # decoded textures are generated images, unloaded ones are shrunk to a single pixel
+        return not image.get("sins2_unloaded", False)
+
+    def size(self, image):
+        width, height = image.size
+        return width * height * image.channels * (4 if image.is_float else 1)
+
+    def touch(self, image):
+        self.last_used[image.name] = time.monotonic()
+
+    def referenced_images(self):
+        images = set()
+        for obj in bpy.context.view_layer.objects:
+            if not obj.visible_get():
+                continue
+            for slot in obj.material_slots:
+                if not slot.material or not slot.material.node_tree:
+                    continue
+                for node in slot.material.node_tree.nodes:
+                    if node.type == "TEX_IMAGE" and node.image:
+                        images.add(node.image.name)
+        return images
+
+    def unload(self, image):
+        if image.source == "FILE":
+            # blender reads file backed images again the next time they are drawn
+            image.buffers_free()
+        else:
+            image.scale(1, 1)
+            image["sins2_unloaded"] = True
+
+    def update(self):
+        """Returns the unloaded images that are visible again and have to be decoded"""
+        now = time.monotonic()
+        referenced = self.referenced_images()
+        images = [image for image in bpy.data.images if self.is_managed(image)]
+
+        # textures of deleted meshes would otherwise stay around until the file is reloaded
+        for image in [image for image in images if image.users == 0]:
+            self.last_used.pop(image.name, None)
+            images.remove(image)
+            bpy.data.images.remove(image)
+
+        reload, idle = [], []
+        for image in images:
+            if image.name in referenced:
+                self.last_used[image.name] = now
+                if image.get("sins2_unloaded"):
+                    reload.append(image)
+            elif self.is_loaded(image):
+                idle.append(image)
+
+        total_size = sum(self.size(image) for image in images if self.is_loaded(image))
+        for image in sorted(idle, key=lambda image: self.last_used.get(image.name, 0)):
+            if total_size <= self.budget:
+                break
+            if now - self.last_used.setdefault(image.name, now) < MIN_IDLE_SECONDS:
+                continue
+            total_size -= self.size(image)
+            self.unload(image)
+
+        return reload
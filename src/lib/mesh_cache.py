@@ -0,0 +1,60 @@
+import hashlib, json, os, zipfile
+import numpy as np
+from .helpers.filesystem import write_atomically, touch, evict_lru
+
+# bump whenever the decoded layout changes so stale entries are never read back
+CACHE_VERSION = 2
+ARRAY_KEYS = ["positions", "normals", "tangents", "uv0", "uv1", "has_uv1", "indices", "primitives"]
+
+
+class MeshCache:
+    def __init__(self, path, max_size_mb=1024):
+        self.path = path
+        self.max_size = max_size_mb * 1024 * 1024
+
+    def key(self, file_path):
+        """Content hash of the source mesh, independent of its name or location"""
+        digest = hashlib.sha256(f"v{CACHE_VERSION}".encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.path, f"{key}.npz")
+
+    def get(self, key):
+        entry = self.entry(key)
+        try:
+            with np.load(entry, allow_pickle=False) as f:
+                mesh_data = {k: f[k] for k in ARRAY_KEYS}
+                meta = json.loads(f["meta"].tobytes().decode("utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile) as e:
+            # truncated or corrupt entry, e.g. left behind by a crash, gets decoded again
+            print(f"MeshCache.get() removed unreadable cache entry {entry}: {e}")
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+            return None
+
+        touch(entry)
+        mesh_data["meshpoints"] = meta.pop("meshpoints")
+        mesh_data["materials"] = meta.pop("materials")
+        return mesh_data, meta
+
+    def put(self, key, mesh_data, meta=None):
+        meta = dict(
+            meta or {}, meshpoints=mesh_data["meshpoints"], materials=mesh_data["materials"]
+        )
+        arrays = {k: mesh_data[k] for k in ARRAY_KEYS}
+        arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+
+        try:
+            write_atomically(self.entry(key), lambda f: np.savez(f, **arrays))
+        except OSError as e:
+            print(f"MeshCache.put() could not write cache entry: {e}")
+            return
+        evict_lru(self.path, ".npz", self.max_size)
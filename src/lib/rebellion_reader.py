@@ -0,0 +1,200 @@
+from .helpers.filesystem import basename
+from .helpers.mesh import MeshMaterial
+import json
+import numpy as np
+
+TEXTURE_KEYS = {
+    "diffusetexturefilename": "clr",
+    "normaltexturefilename": "nrm",
+    "selfilluminationtexturefilename": "da",
+    "teamcolortexturefilename": "tm",
+}
+
+
+def get_tangent_signs(positions, normals, tangents, uvs, indices):
+    """Handedness of each tangent frame, negative where the uv island is mirrored"""
+    triangles = indices.reshape(-1, 3)
+    edges = positions[triangles[:, 1:]] - positions[triangles[:, :1]]
+    uv_edges = uvs[triangles[:, 1:]] - uvs[triangles[:, :1]]
+
+    # bitangent of each triangle scaled by twice its uv area, which keeps mirrored ones flipped
+    bitangents = edges[:, 1] * uv_edges[:, 0, :1] - edges[:, 0] * uv_edges[:, 1, :1]
+    uv_area = uv_edges[:, 0, 0] * uv_edges[:, 1, 1] - uv_edges[:, 1, 0] * uv_edges[:, 0, 1]
+    bitangents *= np.sign(uv_area)[:, None]
+
+    vertex_bitangents = np.zeros_like(positions)
+    for corner in range(3):
+        np.add.at(vertex_bitangents, triangles[:, corner], bitangents)
+    handedness = np.einsum("ij,ij->i", np.cross(normals, tangents[:, :3]), vertex_bitangents)
+    return np.where(handedness < 0, -1.0, 1.0).astype(np.float32)
+
+
+class RebellionReader:
+    """Reads the text variant of Sins 1 meshes into the same layout as BinaryReader"""
+
+    def __init__(self):
+        self.materials = []
+        self.meshpoints = []
+        self.primitives = []
+
+        self.block = None
+        self.orientation = None
+
+    def vector(self, tokens):
+        return [float(x) for x in tokens if x not in ("[", "]")]
+
+    def string(self, line):
+        parts = line.split('"')
+        return parts[1] if len(parts) > 2 else ""
+
+    def material(self, key, line):
+        if key in TEXTURE_KEYS:
+            self.materials[-1][TEXTURE_KEYS[key]] = self.string(line)
+
+    def meshpoint(self, key, tokens, line):
+        meshpoint = self.meshpoints[-1]
+        if key == "datastring":
+            meshpoint["name"] = self.string(line)
+        elif key == "position":
+            meshpoint["position"] = self.vector(tokens[1:])
+        elif key == "orientation":
+            self.orientation = meshpoint["rotation"] = []
+        elif key == "attachedtoboneindex":
+            meshpoint["bone_index"] = int(tokens[1])
+
+    def vertex(self, key, tokens):
+        primitive = self.primitives[-1]
+        if key == "position":
+            primitive["positions"][-1] = self.vector(tokens[1:])
+        elif key == "normal":
+            primitive["normals"][-1] = self.vector(tokens[1:])
+        elif key == "tangent":
+            # the handedness is filled in from the uv winding unless the file has it
+            primitive["tangents"][-1] = (self.vector(tokens[1:]) + [np.nan])[:4]
+        elif key in ("u0", "v0", "u1", "v1"):
+            uv = primitive["uv0" if key[1] == "0" else "uv1"][-1]
+            uv[0 if key[0] == "u" else 1] = float(tokens[1])
+
+    def parse(self, lines):
+        for line in lines:
+            tokens = line.split()
+            if not tokens:
+                continue
+            key = tokens[0].lower()
+
+            # orientation rows follow their header as bare vectors
+            if key == "[":
+                if self.orientation is not None and len(self.orientation) < 9:
+                    self.orientation.extend(self.vector(tokens))
+                continue
+            self.orientation = None
+
+            if key == "material":
+                self.block = "material"
+                self.materials.append({})
+            elif key == "point":
+                self.block = "point"
+                self.meshpoints.append(
+                    {"name": "", "position": [0, 0, 0], "rotation": [], "bone_index": -1}
+                )
+            elif key == "primitive":
+                self.block = "primitive"
+                self.primitives.append(
+                    {
+                        "material_index": 0,
+                        "positions": [],
+                        "normals": [],
+                        "tangents": [],
+                        "uv0": [],
+                        "uv1": [],
+                        "triangles": [],
+                    }
+                )
+            elif key == "vertex" and self.primitives:
+                self.block = "vertex"
+                primitive = self.primitives[-1]
+                primitive["positions"].append([0.0, 0.0, 0.0])
+                primitive["normals"].append([0.0, 0.0, 1.0])
+                primitive["tangents"].append([1.0, 0.0, 0.0, np.nan])
+                primitive["uv0"].append([0.0, 0.0])
+                primitive["uv1"].append([0.0, 0.0])
+            elif key == "triangle" and self.primitives:
+                self.block = "triangle"
+                self.primitives[-1]["triangles"].append([0, 0, 0])
+            elif self.block == "material":
+                self.material(key, line)
+            elif self.block == "point":
+                self.meshpoint(key, tokens, line)
+            elif self.block == "primitive" and key == "materialindex":
+                self.primitives[-1]["material_index"] = int(tokens[1])
+            elif self.block == "vertex":
+                self.vertex(key, tokens)
+            elif self.block == "triangle" and key.startswith("ivertex"):
+                self.primitives[-1]["triangles"][-1][int(key[-1])] = int(tokens[1])
+
+    def material_names(self, mesh_name):
+        names = []
+        for i, material in enumerate(self.materials):
+            name = basename(material.get("clr", "")).lower() or f"{mesh_name}_{i}"
+            names.append(name if name not in names else f"{name}_{i}")
+        return names
+
+    def mesh_materials(self, mesh_name):
+        mesh_materials = {}
+        for name, material in zip(self.material_names(mesh_name), self.materials):
+            mesh_material = MeshMaterial(
+                clr=basename(material.get("clr", "")), nrm=basename(material.get("nrm", ""))
+            )
+            mesh_materials[name] = json.dumps(mesh_material.json(), indent=4)
+        return mesh_materials
+
+    def mesh_data(self, mesh_name):
+        keys = ["positions", "normals", "tangents", "uv0", "uv1"]
+        arrays = {key: [] for key in keys}
+        indices, primitives = [], []
+        vertex_count = index_count = 0
+
+        for primitive in self.primitives:
+            for key in keys:
+                arrays[key].extend(primitive[key])
+            triangles = np.array(primitive["triangles"], dtype=np.uint32).reshape(-1, 3)
+            indices.append(triangles.ravel() + vertex_count)
+            primitives.append([primitive["material_index"], index_count, triangles.size])
+            vertex_count += len(primitive["positions"])
+            index_count += triangles.size
+
+        mesh_data = {key: np.array(value, dtype=np.float32) for key, value in arrays.items()}
+        for key, width in zip(keys, [3, 3, 4, 2, 2]):
+            mesh_data[key] = mesh_data[key].reshape(-1, width)
+        mesh_data["has_uv1"] = np.ones(vertex_count, dtype=bool)
+        mesh_data["indices"] = (
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.uint32)
+        ).astype(np.uint32)
+
+        tangents = mesh_data["tangents"]
+        missing = np.isnan(tangents[:, 3])
+        if missing.any():
+            signs = get_tangent_signs(
+                mesh_data["positions"],
+                mesh_data["normals"],
+                tangents,
+                mesh_data["uv0"],
+                mesh_data["indices"],
+            )
+            tangents[missing, 3] = signs[missing]
+        mesh_data["primitives"] = np.array(primitives, dtype=np.uint32).reshape(-1, 3)
+        mesh_data["meshpoints"] = [
+            dict(meshpoint, rotation=meshpoint["rotation"] or [1, 0, 0, 0, 1, 0, 0, 0, 1])
+            for meshpoint in self.meshpoints
+        ]
+        mesh_data["materials"] = self.material_names(mesh_name)
+        return mesh_data
+
+    @staticmethod
+    def initialize_from(mesh_file):
+        reader = RebellionReader()
+        with open(mesh_file, "r", errors="replace") as f:
+            if not f.readline().strip().upper().startswith("TXT"):
+                raise ValueError(f"{mesh_file} is not a text Sins 1 mesh")
+            reader.parse(f)
+        return reader
@@ -1,14 +1,10 @@
 import json, os
+from ...constants import ADDON_DATA_PATH
 
 
 class TemplateManager:
     def __init__(self):
-        self.templates_file = os.path.join(
-            os.environ["LOCALAPPDATA"],
-            "sins2",
-            "sins2-blender-extension",
-            "camera_templates.json",
-        )
+        self.templates_file = os.path.join(ADDON_DATA_PATH, "camera_templates.json")
 
     def save_template(self, name, props):
         """Save a camera template with multiple cameras"""
@@ -0,0 +1,133 @@
+import hashlib, json, os, shutil, tempfile, threading
+import numpy as np
+from .helpers.filesystem import write_atomically, touch, evict_lru
+from .helpers.mesh_utils import run_texconv
+
+# bump whenever the texconv arguments change so stale conversions are never reused
+CACHE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+# texconv conversions and pixels decoded by the DDS reader
+ENTRY_SUFFIXES = (".dds", ".npy")
+
+
+class TextureCache:
+    """Converted and decoded textures stored by content hash, with a manifest mapping source files
+    to hashes"""
+
+    def __init__(self, path, max_size_mb=2048):
+        self.path = path
+        self.max_size = max_size_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.manifest = None
+
+    def source(self, texture):
+        return os.path.normcase(os.path.abspath(texture))
+
+    def entry(self, key):
+        return os.path.join(self.path, f"{key}.dds")
+
+    def load_manifest(self):
+        if self.manifest is None:
+            try:
+                with open(os.path.join(self.path, MANIFEST_FILE), "r") as f:
+                    self.manifest = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.manifest = {}
+        return self.manifest
+
+    def save_manifest(self):
+        with self.lock:
+            # merge with whatever other instances have written meanwhile
+            manifest, self.manifest = self.manifest or {}, None
+            manifest = dict(self.load_manifest(), **manifest)
+            # records of deleted textures would otherwise pile up forever
+            manifest = {
+                source: record for source, record in manifest.items() if os.path.exists(source)
+            }
+            self.manifest = manifest
+            contents = json.dumps(manifest, indent=4)
+
+        try:
+            write_atomically(os.path.join(self.path, MANIFEST_FILE), contents.encode("utf-8"))
+        except OSError as e:
+            print(f"TextureCache.save_manifest() could not write manifest: {e}")
+
+    def key(self, texture):
+        """Content hash of the source texture, only recomputed when its mtime or size changes"""
+        source = self.source(texture)
+        stat = os.stat(source)
+        with self.lock:
+            record = self.load_manifest().get(source)
+        if record and record["mtime"] == stat.st_mtime and record["size"] == stat.st_size:
+            return record["hash"]
+
+        digest = hashlib.sha256(f"v{CACHE_VERSION}".encode("utf-8"))
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        key = digest.hexdigest()
+
+        with self.lock:
+            self.manifest[source] = {"mtime": stat.st_mtime, "size": stat.st_size, "hash": key}
+        return key
+
+    def pixels_entry(self, key, mip_level):
+        return os.path.join(self.path, f"{key}_{mip_level}.npy")
+
+    def get_pixels(self, texture, mip_level):
+        """Pixels the DDS reader decoded earlier, generated images aren't saved with the .blend"""
+        entry = self.pixels_entry(self.key(texture), mip_level)
+        try:
+            pixels = np.load(entry, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError) as e:
+            print(f"TextureCache.get_pixels() removed unreadable cache entry {entry}: {e}")
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+            return None
+
+        touch(entry)
+        return pixels
+
+    def put_pixels(self, texture, mip_level, pixels):
+        entry = self.pixels_entry(self.key(texture), mip_level)
+        try:
+            write_atomically(entry, lambda f: np.save(f, pixels, allow_pickle=False))
+        except OSError as e:
+            print(f"TextureCache.put_pixels() could not write cache entry: {e}")
+            return
+        evict_lru(self.path, ENTRY_SUFFIXES, self.max_size)
+
+    def get(self, texture):
+        entry = self.entry(self.key(texture))
+        if not os.path.exists(entry):
+            return None
+        touch(entry)
+        return entry
+
+    def convert(self, texture):
+        """Returns the converted texture, running texconv only when no matching entry exists"""
+        entry = self.get(texture)
+        if entry:
+            return entry
+
+        os.makedirs(self.path, exist_ok=True)
+        # texconv names its output itself, the finished file is moved in as the entry
+        tmp_dir = tempfile.mkdtemp(dir=self.path, suffix=".tmp")
+        try:
+            run_texconv(texture, tmp_dir)
+            converted = os.path.join(
+                tmp_dir, f"{os.path.splitext(os.path.basename(texture))[0]}.dds"
+            )
+            if not os.path.exists(converted):
+                raise FileNotFoundError(f"texconv did not produce: {converted}")
+            entry = self.entry(self.key(texture))
+            os.replace(converted, entry)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        evict_lru(self.path, ENTRY_SUFFIXES, self.max_size)
+        return entry
@@ -0,0 +1,4 @@
+import os, sys
+
+# the add-on's own __init__ needs bpy, the readers and writers are imported without it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
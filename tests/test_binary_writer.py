@@ -0,0 +1,26 @@
+"""Checks the native writer against real meshes. Game meshes can't be redistributed, copy a few
+from the game's or a mod's meshes folder (or meshbuilder output) into tests/fixtures first"""
+
+import glob, os
+import pytest
+from src.lib.binary_reader import BinaryReader
+from src.lib.binary_writer import BinaryWriter, MESH_HEADER, MESH_PADDING
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "fixtures", "*.mesh")))
+requires_fixtures = pytest.mark.skipif(not FIXTURES, reason="no .mesh files in tests/fixtures")
+
+
+@requires_fixtures
+@pytest.mark.parametrize("mesh_file", FIXTURES, ids=os.path.basename)
+def test_round_trip(mesh_file):
+    with open(mesh_file, "rb") as f:
+        original = f.read()
+    reader = BinaryReader.from_buffer(original)
+    assert bytes(BinaryWriter.from_reader(reader).buffer) == original
+
+
+@requires_fixtures
+@pytest.mark.parametrize("mesh_file", FIXTURES, ids=os.path.basename)
+def test_header_template(mesh_file):
+    with BinaryReader.initialize_from(mesh_file) as reader:
+        assert reader.header_template() == (MESH_HEADER, MESH_PADDING)
@@ -1,4 +1,7 @@
-import bpy, json, os, math, subprocess, re, shutil, time, bmesh, sys
+import bpy, json, os, math, subprocess, re, shutil, tempfile, time, bmesh, sys
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from struct import unpack, pack
 from bpy_extras.io_utils import ExportHelper, ImportHelper
 from mathutils import Vector, Matrix
@@ -6,25 +9,31 @@ from . import bl_info
 from .constants import TEMP_TEXTURES_PATH
 from .src.lib.github_downloader import Github
 from .src.lib.binary_reader import BinaryReader
+from .src.lib.binary_writer import BinaryWriter
+from .src.lib.rebellion_reader import RebellionReader
+from .src.lib.mesh_cache import MeshCache
+from .src.lib.texture_cache import TextureCache
+from .src.lib.dds_reader import DDSReader
+from .src.lib.asset_index import AssetIndex
+from .src.lib.image_manager import ImageManager
+from .src.lib.export_manifest import ExportManifest, get_export_hash
 from .config import AddonSettings
 from .src.lib.helpers.mesh_utils import (
     get_bounding_box,
     get_unused_materials,
     get_avaliable_sorted_materials,
-    get_materials,
     apply_transforms,
-    get_original_transforms,
     create_and_move_mesh_materials,
-    restore_mesh_transforms,
-    join_meshes,
-    make_meshpoint_rules,
+    create_export_objects,
+    get_export_problems,
+    get_invalid_meshpoint_names,
+    sanitize_rebellion_meshpoints,
     run_meshbuilder,
-    clear_leftovers,
     MeshException,
-    run_texconv,
     convert_rebellion_mesh,
+    get_mesh_export_data,
 )
-from .src.lib.helpers.filesystem import normalize, basename
+from .src.lib.helpers.filesystem import normalize, basename, write_if_changed
 from .src.lib.render_manager import RenderManager
 from .src.lib.image_processor import IconProcessor
 from .constants import (
@@ -34,6 +43,16 @@ from .constants import (
     MESHPOINT_COLOR,
     TEMP_DIR,
     REBELLION_PATH,
+    MESH_CACHE_PATH,
+    TEXTURE_CACHE_PATH,
+    ASSET_INDEX_FILE,
+    EXPORT_MANIFEST_FILE,
+    IMAGE_MANAGER_INTERVAL,
+    PREFETCH_INTERVAL,
+    PREFETCH_IDLE_SECONDS,
+    PREFETCH_CPU_SHARE,
+    SHADER_GROUP_NAME,
+    SHADER_GROUP_VERSION,
 )
 
 github = Github(TEMP_DIR)
@@ -43,8 +62,13 @@ def is_debugging():
     return sys.gettrace() is not None
 
 
+def can_check_for_updates():
+    # headless builds shouldn't depend on the network
+    return not is_debugging() and not bpy.app.background
+
+
 # check for updates when extension activates
-if not is_debugging():
+if can_check_for_updates():
     try:
         github.fetch_latest_downloadable_release_data()
     except:
@@ -55,12 +79,28 @@ settings.init()
 
 SETTINGS = settings.load()
 
-if "is_first_installation" in SETTINGS:
+if "is_first_installation" in SETTINGS and can_check_for_updates():
     SETTINGS["current_version"] = github.hash
     del SETTINGS["is_first_installation"]
     settings.save()
 
-has_update = False if is_debugging() else SETTINGS["current_version"] != github.hash
+has_update = (
+    SETTINGS["current_version"] != github.hash if can_check_for_updates() else False
+)
+
+mesh_cache = MeshCache(MESH_CACHE_PATH, SETTINGS["mesh_cache_size_mb"])
+texture_cache = TextureCache(TEXTURE_CACHE_PATH, SETTINGS["texture_cache_size_mb"])
+asset_index = AssetIndex(ASSET_INDEX_FILE)
+image_manager = ImageManager(SETTINGS["image_memory_budget_mb"])
+export_manifest = ExportManifest(EXPORT_MANIFEST_FILE)
+texture_pool = None
+texture_jobs = {}
+prefetch_queue = deque()
+prefetch_job = None
+prefetch_selection = set()
+prefetch_hdri = ""
+prefetch_views = []
+last_interaction = 0.0
 
 
 class SINSII_Main_Panel:
@@ -100,6 +140,15 @@ class SINSII_PT_Panel(SINSII_Main_Panel, bpy.types.Panel):
         row.operator("sinsii.export_mesh", icon="EXPORT", text="Export mesh")
         row.separator(factor=0.5)
         row.operator("sinsii.import_mesh", icon="IMPORT", text="Import mesh")
+        self.layout.operator(
+            "sinsii.batch_export_meshes", icon="EXPORT", text="Batch export collection"
+        )
+        if get_preview_images():
+            self.layout.operator(
+                "sinsii.load_full_resolution_textures",
+                icon="TEXTURE",
+                text="Full Res Textures",
+            )
         # col.separator(factor=1.0)
         # col.operator("sinsii.debug")
 
@@ -666,16 +715,6 @@ class SINSII_PT_Meshpoint_Documentation(SINSII_Main_Panel, bpy.types.Panel):
         )
 
 
-def flip_normals(mesh):
-    try:
-        bpy.context.view_layer.objects.active = mesh
-        bpy.ops.object.editmode_toggle()
-        bpy.ops.mesh.select_all(action="SELECT")
-        bpy.ops.mesh.flip_normals()
-        bpy.ops.object.editmode_toggle()
-    except:
-        pass
-
 class SINSII_OT_Sync_Empty_Color(bpy.types.Operator):
     bl_label = "Synchronize Meshpoint Color"
     bl_description = "Changes Blender Empty color to a cyan-like blue"
@@ -988,41 +1027,41 @@ def load_mesh_data(self, mesh_data, mesh_name, mesh, mesh_materials_path):
     materials = mesh_data["materials"]
     meshpoints = mesh_data["meshpoints"]
 
-    vert_arr, normal_arr, uv_coords = [], [], {x: [] for x in ["uv0", "uv1"]}
-
-    for i, vertex in enumerate(mesh_data["vertices"]):
-        p = tuple(
-            GAME_MATRIX @ Vector([vertex["p"][0], vertex["p"][1], -vertex["p"][2]])
-        )
-        vert_arr.append(p)
-
-        n = tuple(
-            GAME_MATRIX @ Vector([-vertex["n"][0], -vertex["n"][1], vertex["n"][2]])
-        )
-        normal_arr.append(n)
-
-        uv0 = [vertex["uv0"][0], 1 - vertex["uv0"][1]]
-        uv_coords["uv0"].append(uv0)
-
-        if vertex["uv1"]:
-            uv1 = [vertex["uv1"][0], 1 - vertex["uv1"][1]]
-            uv_coords["uv1"].append(uv1)
-        else:
-            # failsafe
-            uv_coords["uv1"].append([0, 0])
+    # GAME_MATRIX @ (x, y, -z), applied to positions and normals alike
+    p = mesh_data["positions"]
+    vert_arr = np.stack((-p[:, 0], -p[:, 2], p[:, 1]), axis=1)
+    n = mesh_data["normals"]
+    normal_arr = np.stack((-n[:, 0], -n[:, 2], n[:, 1]), axis=1)
 
-    for i in range(2):
-        mesh.uv_layers.new(name=f"uv{i}")
+    uv_coords = {x: mesh_data[x].copy() for x in ["uv0", "uv1"]}
+    for uv in uv_coords.values():
+        uv[:, 1] = 1 - uv[:, 1]
+    # failsafe
+    uv_coords["uv1"][~mesh_data["has_uv1"]] = 0
 
     indices = mesh_data["indices"]
-    loops = []
-    for i in range(0, len(indices), 3):
-        idx0, idx1, idx2 = indices[i : i + 3]
-        if idx0 != idx1 and idx1 != idx2 and idx0 != idx2:
-            loops.append((idx0, idx1, idx2))
-
-    mesh.from_pydata(vert_arr, [], loops)
-    mesh.update()
+    triangles = indices[: len(indices) // 3 * 3].reshape(-1, 3).astype(np.int32)
+    triangle_materials = np.zeros(len(triangles), dtype=np.int32)
+    for mat_idx, start, count in primitives:
+        triangle_materials[start // 3 : (start + count) // 3] = mat_idx
+
+    idx0, idx1, idx2 = triangles.T
+    is_valid = (idx0 != idx1) & (idx1 != idx2) & (idx0 != idx2)
+    # the swizzle mirrors the mesh, so the winding is reversed to keep the faces pointing outwards
+    triangles = triangles[is_valid][:, [0, 2, 1]]
+    triangle_materials = triangle_materials[is_valid]
+    loops = triangles.ravel()
+
+    mesh.vertices.add(len(vert_arr))
+    mesh.vertices.foreach_set("co", vert_arr.ravel())
+    mesh.loops.add(len(loops))
+    mesh.loops.foreach_set("vertex_index", loops)
+    mesh.polygons.add(len(triangles))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, len(loops), 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+
+    for name, uv in uv_coords.items():
+        mesh.uv_layers.new(name=name).data.foreach_set("uv", uv[loops].ravel())
 
     obj = bpy.data.objects.new(name=mesh_name, object_data=mesh)
     scene = bpy.context.scene
@@ -1030,43 +1069,41 @@ def load_mesh_data(self, mesh_data, mesh_name, mesh, mesh_materials_path):
     bpy.context.view_layer.objects.active = obj
     obj.select_set(True)
 
-    bm = bmesh.new()
-    bm.from_mesh(mesh)
-
-    for face in bm.faces:
-        for loop in face.loops:
-            loop[bm.loops.layers.uv["uv0"]].uv = uv_coords["uv0"][loop.vert.index]
-            loop[bm.loops.layers.uv["uv1"]].uv = uv_coords["uv1"][loop.vert.index]
-    bm.to_mesh(mesh)
-    bm.free()
-
     textures_path = normalize(self.filepath, "../../textures")
+    mip_level = int(self.texture_resolution)
+    # lets the prefetcher resolve the materials again once the mesh is selected
+    obj["sins2_mesh_materials_path"] = mesh_materials_path
+    obj["sins2_textures_path"] = textures_path
     for material in materials:
-        if not os.path.exists(mesh_materials_path):
-            new_mat = bpy.data.materials.new(name=material)
-        if mesh_materials_path == REBELLION_PATH:
-            new_mat = create_rebellion_shader_nodes(
-                material, mesh_materials_path, textures_path
-            )
+        textures = load_mesh_material(material, mesh_materials_path, textures_path)
+        is_rebellion = mesh_materials_path == REBELLION_PATH
+        material_key = get_material_key(material, textures, is_rebellion)
+        new_mat = get_imported_material(material_key)
+
+        if new_mat:
+            # sharpen the shared images if this import asked for a finer mip level
+            for texture in textures:
+                if texture and os.path.exists(texture):
+                    load_dds_image(texture, mip_level)
         else:
-            new_mat = create_shader_nodes(material, mesh_materials_path, textures_path)
+            if is_rebellion:
+                new_mat = create_rebellion_shader_nodes(
+                    material, mesh_materials_path, textures_path, mip_level
+                )
+            else:
+                new_mat = create_shader_nodes(
+                    material, mesh_materials_path, textures_path, mip_level
+                )
+            new_mat["sins2_key"] = material_key
         mesh.materials.append(new_mat)
 
-    for primitive in primitives:
-        mat_idx = primitive["material_index"]
-        start = primitive["vertex_index_start"]
-        count = primitive["vertex_index_count"]
-        end = start + count
-        for i in range(start // 3, end // 3):
-            if i < len(mesh.polygons):
-                mesh.polygons[i].material_index = mat_idx
+    mesh.polygons.foreach_set("material_index", triangle_materials)
 
     mesh.update()
-    mesh.polygons.foreach_set("use_smooth", [True] * len(mesh.polygons))
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
     mesh.normals_split_custom_set_from_vertices(normal_arr)
 
     radius = get_bounding_box(obj)[0]
-    flip_normals(obj)
 
     name_indices = {}
     for i, meshpoint in enumerate(meshpoints):
@@ -1074,16 +1111,15 @@ def load_mesh_data(self, mesh_data, mesh_name, mesh, mesh_materials_path):
         pos = meshpoint["position"]
         rot = meshpoint["rotation"]
 
-        bpy.ops.object.empty_add(type="ARROWS")
-
-        empty = bpy.context.object
-        empty.empty_display_size = radius * 0.05
         if name in name_indices:
             name_indices[name] += 1
-            empty.name = f"{name}-{name_indices[name]}"
+            empty = bpy.data.objects.new(f"{name}-{name_indices[name]}", None)
         else:
             name_indices[name] = 0
-            empty.name = name
+            empty = bpy.data.objects.new(name, None)
+        scene.collection.objects.link(empty)
+        empty.empty_display_type = "ARROWS"
+        empty.empty_display_size = radius * 0.05
         empty.location = GAME_MATRIX @ Vector((pos[0], pos[1], -pos[2]))
         empty.parent = obj
         empty.rotation_euler = (
@@ -1101,28 +1137,147 @@ def load_mesh_data(self, mesh_data, mesh_name, mesh, mesh_materials_path):
     return obj, radius
 
 
-def is_rebellion_mesh(file_path):
-    with open(file_path, "tr") as txt_file:
-        try:
-            if txt_file.readable() and "TXT" in txt_file.readline():
-                convert_rebellion_mesh(file_path, file_path, "bin")
-        except:
-            pass
+def get_material_key(material, textures, is_rebellion):
+    """Materials resolving to the same textures are shared between imports"""
+    # the name is part of the key since exports reference mesh_materials by name
+    sources = [
+        os.path.normcase(os.path.abspath(texture)) if texture else ""
+        for texture in textures
+    ]
+    return json.dumps(["rebellion" if is_rebellion else "sins2", material, *sources])
+
+
+def get_imported_material(material_key):
+    return next(
+        (
+            material
+            for material in bpy.data.materials
+            if material.get("sins2_key") == material_key
+        ),
+        None,
+    )
+
 
+def get_rebellion_mesh_format(file_path):
     with open(file_path, "rb") as f:
-        header = f.read(4).decode("utf-8")
-        if header.startswith("BIN"):
-            return True
+        header = f.read(4)
+    for mesh_format in ["TXT", "BIN"]:
+        if header.startswith(mesh_format.encode("utf-8")):
+            return mesh_format
+    return None
 
-    return False
 
+def is_rebellion_mesh(file_path):
+    return get_rebellion_mesh_format(file_path) is not None
 
-def import_mesh(self, file_path):
-    mesh_name = file_path.rsplit("\\", 1)[1].split(".mesh")[0]
-    mesh = bpy.data.meshes.new(name=mesh_name)
-    print("Loading: ", mesh_name)
+
+def read_mesh_data(mesh_file):
+    with BinaryReader.initialize_from(mesh_file=mesh_file) as reader:
+        return dict(
+            reader.arrays, meshpoints=reader.meshpoints, materials=reader.materials
+        )
+
+
+def read_rebellion_mesh_data(file_path):
+    os.makedirs(REBELLION_PATH, exist_ok=True)
     try:
+        return read_rebellion_mesh_data_natively(file_path)
+    except Exception as e:
+        print(f"Could not read Sins 1 mesh natively, falling back to meshbuilder: {e}")
+        return read_rebellion_mesh_data_with_meshbuilder(file_path)
+
+
+def read_rebellion_mesh_data_natively(file_path):
+    mesh_name = basename(file_path)
+    if get_rebellion_mesh_format(file_path) == "TXT":
+        reader = RebellionReader.initialize_from(file_path)
+    else:
+        # binary meshes are still expanded to text once, the text is parsed in memory
+        dest = os.path.join(REBELLION_PATH, f"{mesh_name}.sins1_mesh")
+        shutil.copy(file_path, dest)
+        convert_rebellion_mesh(file_path, dest, "txt")
+        try:
+            reader = RebellionReader.initialize_from(dest)
+        finally:
+            os.remove(dest)
+
+    mesh_data = reader.mesh_data(mesh_name)
+    write_rebellion_mesh_materials(reader.mesh_materials(mesh_name))
+
+    # rename every malformed meshpoint in one pass, the same way the meshbuilder fallback does
+    malformed_meshpoints = get_invalid_meshpoint_names(
+        [meshpoint["name"] for meshpoint in mesh_data["meshpoints"]],
+        SETTINGS["meshpoint_rules"],
+    )
+    for meshpoint in mesh_data["meshpoints"]:
+        if meshpoint["name"] in malformed_meshpoints:
+            print(f"invalid mesh point: '{meshpoint['name']}', renaming...")
+            meshpoint["name"] = f"Flair-{meshpoint['name']}-remove_flair_prefix"
+
+    return mesh_data, malformed_meshpoints
+
+
+def read_rebellion_mesh_data_with_meshbuilder(file_path):
+    dest = os.path.join(REBELLION_PATH, f"{basename(file_path)}.sins1_mesh")
+
+    shutil.copy(file_path, dest)
+    convert_rebellion_mesh(file_path, dest, "txt")
 
+    malformed_meshpoints = sanitize_rebellion_meshpoints(
+        dest, SETTINGS["meshpoint_rules"]
+    )
+
+    while True:
+        try:
+            run_meshbuilder(file_path=dest, dest_path=REBELLION_PATH)
+            break
+        except MeshException as e:
+            # only reached if meshbuilder rejects a name the rules accepted
+            if e.kind != "mesh_point" or e.message in malformed_meshpoints:
+                raise ValueError(e.message)
+            malformed_meshpoints += sanitize_rebellion_meshpoints(
+                dest, rules=None, malformed=[e.message]
+            )
+
+    os.remove(dest)
+
+    mesh_data = read_mesh_data(
+        os.path.join(REBELLION_PATH, f"{basename(file_path)}.mesh")
+    )
+
+    return mesh_data, malformed_meshpoints
+
+
+def read_rebellion_mesh_materials(materials):
+    mesh_materials = {}
+    for material in materials:
+        mesh_material = os.path.join(REBELLION_PATH, f"{material}.mesh_material")
+        if os.path.exists(mesh_material):
+            with open(mesh_material, "r") as f:
+                mesh_materials[material] = f.read()
+    return mesh_materials
+
+
+def write_rebellion_mesh_materials(mesh_materials):
+    os.makedirs(REBELLION_PATH, exist_ok=True)
+    for material, contents in mesh_materials.items():
+        mesh_material = os.path.join(REBELLION_PATH, f"{material}.mesh_material")
+        # materials left by an earlier import of the same mesh are brought up to date
+        write_if_changed(mesh_material, contents.encode("utf-8"))
+
+
+def parse_mesh(file_path):
+    """Reads (and converts Sins 1 meshes) without touching bpy, safe to run off the main thread"""
+    key = mesh_cache.key(file_path)
+    cached = mesh_cache.get(key)
+
+    if cached:
+        mesh_data, meta = cached
+        is_rebellion = meta["is_rebellion"]
+        malformed_meshpoints = meta["malformed_meshpoints"]
+        if is_rebellion:
+            write_rebellion_mesh_materials(meta["mesh_materials"])
+    else:
         #  _____ _____ _   _  _____     _____
         # /  ___|_   _| \ | |/  ___|   / __  \
         # \ `--.  | | |  \| |\ `--.    `' / /'
@@ -1131,62 +1286,72 @@ def import_mesh(self, file_path):
         # \____/ \___/\_| \_/\____/    \_____/
 
         # handle sins 1 meshes
-        if not is_rebellion_mesh(file_path):
-            mesh_materials_path = normalize(file_path, "../../mesh_materials")
-            reader = BinaryReader.initialize_from(mesh_file=file_path)
+        is_rebellion = is_rebellion_mesh(file_path)
+        if not is_rebellion:
+            mesh_data, malformed_meshpoints = read_mesh_data(file_path), []
         else:
-            os.makedirs(REBELLION_PATH, exist_ok=True)
-
-            mesh_materials_path = REBELLION_PATH
-            dest = os.path.join(REBELLION_PATH, f"{basename(file_path)}.sins1_mesh")
+            mesh_data, malformed_meshpoints = read_rebellion_mesh_data(file_path)
+
+        mesh_cache.put(
+            key,
+            mesh_data,
+            {
+                "is_rebellion": is_rebellion,
+                "malformed_meshpoints": malformed_meshpoints,
+                "mesh_materials": (
+                    read_rebellion_mesh_materials(mesh_data["materials"])
+                    if is_rebellion
+                    else {}
+                ),
+            },
+        )
 
-            shutil.copy(file_path, dest)
-            convert_rebellion_mesh(file_path, dest, "txt")
+    if is_rebellion:
+        mesh_materials_path = REBELLION_PATH
+    else:
+        mesh_materials_path = normalize(file_path, "../../mesh_materials")
 
-            malformed_meshpoints = []
+    return mesh_data, mesh_materials_path, malformed_meshpoints
 
-            while True:
-                try:
-                    run_meshbuilder(file_path=dest, dest_path=REBELLION_PATH)
-                    break
-                except MeshException as e:
-                    if e.kind == "mesh_point":
-                        with open(dest, "r+") as f:
-                            lines = f.readlines()
-                            for i, line in enumerate(lines):
-                                if re.search(rf'.*"{e.message}"', line):
-                                    print(
-                                        f"invalid mesh point: '{e.message}', renaming..."
-                                    )
-                                    lines[i] = line.replace(
-                                        e.message,
-                                        f"Flair-{e.message}-remove_flair_prefix",
-                                    )
-                                    malformed_meshpoints.append(e.message)
-                                    break
-                            f.seek(0)
-                            f.truncate()
-                            f.writelines(lines)
-
-                        convert_rebellion_mesh(dest, dest, "txt")
-                    else:
-                        raise ValueError(e.message)
 
-            os.remove(dest)
+def parse_meshes(file_paths):
+    """Yields a future per file in order, parsing the next files while the current one is built"""
+    workers = max(1, min(len(file_paths), os.cpu_count() or 1))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    paths = iter(file_paths)
+    pending = deque(
+        pool.submit(parse_mesh, path) for _, path in zip(range(workers + 1), paths)
+    )
+    try:
+        while pending:
+            future = pending.popleft()
+            path = next(paths, None)
+            if path is not None:
+                pending.append(pool.submit(parse_mesh, path))
+            yield future
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def import_mesh(self, file_path, parsed=None):
+    mesh_name = os.path.basename(file_path).split(".mesh")[0]
+    print("Loading: ", mesh_name)
+    try:
+        mesh_data, mesh_materials_path, malformed_meshpoints = (
+            parsed.result() if parsed else parse_mesh(file_path)
+        )
 
-            reader = BinaryReader.initialize_from(
-                mesh_file=os.path.join(REBELLION_PATH, f"{basename(file_path)}.mesh")
+        if malformed_meshpoints:
+            self.report(
+                {"WARNING"},
+                f"Found malformed meshpoint names: {[meshpoint for meshpoint in malformed_meshpoints]}",
             )
 
-            if malformed_meshpoints:
-                self.report(
-                    {"WARNING"},
-                    f"Found malformed meshpoint names: {[meshpoint for meshpoint in malformed_meshpoints]}",
-                )
-
-        if bpy.context.space_data.shading.type != "MATERIAL":
-            bpy.context.space_data.shading.type = "MATERIAL"
-            bpy.context.space_data.shading.use_compositor = "ALWAYS"
+        space_data = bpy.context.space_data
+        if space_data and space_data.type == "VIEW_3D":
+            if space_data.shading.type != "MATERIAL":
+                space_data.shading.type = "MATERIAL"
+                space_data.shading.use_compositor = "ALWAYS"
 
         if (5, 0, 0) <= bpy.app.version:
             create_composite_nodes()
@@ -1195,7 +1360,30 @@ def import_mesh(self, file_path):
         self.report({"ERROR"}, f"Mesh import failed: {e}")
         return {"CANCELLED"}
 
-    return load_mesh_data(self, reader.mesh_data, mesh_name, mesh, mesh_materials_path)
+    mesh = bpy.data.meshes.new(name=mesh_name)
+    return load_mesh_data(self, mesh_data, mesh_name, mesh, mesh_materials_path)
+
+
+class SINSII_OT_Load_Full_Resolution_Textures(bpy.types.Operator):
+    bl_idname = "sinsii.load_full_resolution_textures"
+    bl_label = "Load Full Resolution Textures"
+    bl_description = (
+        "Replaces the preview textures of imported meshes with their full resolution"
+    )
+    bl_options = {"REGISTER", "UNDO"}
+
+    @classmethod
+    def poll(cls, context):
+        return len(get_preview_images()) > 0
+
+    def execute(self, context):
+        images = get_preview_images()
+        for image in images:
+            stream_texture(image, 0)
+        if bpy.app.background:
+            apply_streamed_textures(wait=True)
+        self.report({"INFO"}, f"Loading {len(images)} textures at full resolution")
+        return {"FINISHED"}
 
 
 class SINSII_OT_Import_Mesh(bpy.types.Operator, ImportHelper):
@@ -1209,20 +1397,36 @@ class SINSII_OT_Import_Mesh(bpy.types.Operator, ImportHelper):
 
     files: bpy.props.CollectionProperty(type=bpy.types.PropertyGroup)
 
+    texture_resolution: bpy.props.EnumProperty(
+        name="Textures",
+        description="Load textures from a lower DDS mip level for faster viewport previews",
+        items=[
+            ("0", "Full", "Full resolution"),
+            ("1", "1/2", "Half resolution"),
+            ("2", "1/4", "Quarter resolution"),
+            ("3", "1/8", "Eighth resolution"),
+        ],
+        default="0",
+    )
+
     @classmethod
     def poll(cls, context):
         return context.mode == "OBJECT"
 
     def execute(self, context):
         os.makedirs(TEMP_TEXTURES_PATH, exist_ok=True)
+        asset_index.invalidate()
         radius_arr = []
         offset = 0
 
+        file_paths = [
+            os.path.join(os.path.dirname(self.filepath), file.name)
+            for file in self.files
+        ]
+
         try:
-            for i, file in enumerate(self.files):
-                mesh, radius = import_mesh(
-                    self, os.path.join(os.path.dirname(self.filepath), file.name)
-                )
+            for i, parsed in enumerate(parse_meshes(file_paths)):
+                mesh, radius = import_mesh(self, file_paths[i], parsed)
                 radius_arr.append(radius)
                 if i > 0:
                     offset += radius_arr[i - 1] + radius_arr[i]
@@ -1233,11 +1437,15 @@ class SINSII_OT_Import_Mesh(bpy.types.Operator, ImportHelper):
             )
         except:
             pass
+        finally:
+            if bpy.app.background:
+                apply_streamed_textures(wait=True)
+            asset_index.save()
 
         return {"FINISHED"}
 
 
-def sanitize_gltf_document(file_path):
+def sanitize_gltf_document(file_path, node_names):
     with open(f"{file_path}.gltf", "r+") as f:
         gltf_document = json.load(f)
         try:
@@ -1245,6 +1453,9 @@ def sanitize_gltf_document(file_path):
                 del material["doubleSided"]
         except:
             pass
+        # the exported copies stand in for the user's objects, give their names back
+        for node in gltf_document.get("nodes", []):
+            node["name"] = node_names.get(node.get("name"), node.get("name"))
         f.seek(0)
         f.write(json.dumps(gltf_document))
         f.truncate()
@@ -1258,177 +1469,306 @@ def sanitize_mesh_name(mesh_name):
     return mesh_name
 
 
-def export_gltf_document(file_path, export_scene):
-    bpy.ops.export_scene.gltf(
-        filepath=file_path,
-        export_format="GLTF_SEPARATE",
-        export_yup=False,
-        use_selection=export_scene,
-        export_apply=False,
-        export_image_format="NONE",
+def export_gltf_document(file_path, objects, node_names):
+    selected_objects = bpy.context.selected_objects
+    active_object = bpy.context.view_layer.objects.active
+    for obj in selected_objects:
+        obj.select_set(False)
+    for obj in objects:
+        obj.select_set(True)
+    try:
+        bpy.ops.export_scene.gltf(
+            filepath=file_path,
+            export_format="GLTF_SEPARATE",
+            export_yup=False,
+            use_selection=True,
+            export_apply=False,
+            export_image_format="NONE",
+        )
+    finally:
+        for obj in objects:
+            obj.select_set(False)
+        for obj in selected_objects:
+            obj.select_set(True)
+        bpy.context.view_layer.objects.active = active_object
+    sanitize_gltf_document(file_path, node_names)
+
+
+def validate_meshes(meshes, skip_meshpoint_validation=False):
+    """Rejects the export before anything is written, listing every problem at once"""
+    errors, warnings = get_export_problems(
+        meshes,
+        bpy.context.evaluated_depsgraph_get(),
+        None if skip_meshpoint_validation else SETTINGS["meshpoint_rules"],
     )
-    sanitize_gltf_document(file_path)
+    for problem in errors + warnings:
+        print(problem)
+    if errors:
+        raise MeshException("ERROR", "; ".join(errors))
+    return warnings
 
 
-def validate_meshes(mesh, skip_meshpoint_validation=False):
-    invalid_meshpoints = make_meshpoint_rules(mesh, rules=SETTINGS["meshpoint_rules"])
-    if invalid_meshpoints and not skip_meshpoint_validation:
-        raise MeshException(
-            "ERROR",
-            f'Invalid meshpoint names: [ {", ".join(meshpoint for meshpoint in invalid_meshpoints)} ]',
-        )
+def get_export_options(self):
+    return {
+        "use_meshbuilder": self.use_meshbuilder,
+        "skip_meshpoint_validation": self.skip_meshpoint_validation,
+    }
+
+
+def write_mesh_natively(mesh_file, export_data):
+    """Writes the mesh without meshbuilder, reusing the header of the mesh it replaces"""
+    template = None
+    if os.path.exists(mesh_file):
+        try:
+            with BinaryReader.initialize_from(mesh_file) as reader:
+                template = reader.header_template()
+        except Exception as e:
+            print(f"Could not read the header of {mesh_file}: {e}")
+
+    return bytes(BinaryWriter.initialize_from(export_data, template).buffer)
 
-    materials = get_materials(mesh)
-    if type(materials) is str:
-        raise MeshException(
-            "ERROR",
-            'Cannot export "{0}" without any materials'.format(materials),
-        )
+
+def write_mesh(mesh_file, export_hash, contents):
+    """Writes the mesh unless the file already holds the same bytes, returns if it was written"""
+    is_written = write_if_changed(mesh_file, contents)
+    export_manifest.record(mesh_file, export_hash)
+    return is_written
 
 
 def export(self, mesh_name, export_dir):
     now = time.time()
-    original_transforms_arr = []
 
     if not re.match(r"^[a-zA-Z0-9 _-]+$", mesh_name):
         raise MeshException("ERROR", "Invalid mesh name. Avoid special characters.")
 
-    if not self.export_scene:
-        mesh = get_selected_mesh()
-        if not mesh:
-            raise MeshException("WARNING", "You need to select a mesh before exporting")
-        validate_meshes(mesh, self.skip_meshpoint_validation)
-        bpy.ops.object.mode_set(mode="EDIT")
-        bpy.ops.mesh.separate(type="MATERIAL")
-        bpy.ops.object.mode_set(mode="OBJECT")
-        meshes = export_mesh(original_transforms_arr)
-    else:
-        meshes = get_scene_meshes()
-        for mesh in meshes:
-            validate_meshes(mesh, self.skip_meshpoint_validation)
-            bpy.context.view_layer.objects.active = mesh
-            materials = get_materials(mesh)
-            if len(materials) > 1:
-                bpy.ops.object.mode_set(mode="EDIT")
-                bpy.ops.mesh.separate(type="MATERIAL")
-                bpy.ops.object.mode_set(mode="OBJECT")
-        meshes = export_scene(original_transforms_arr)
+    meshes = get_all_meshes(self.export_scene)
+    if not meshes:
+        raise MeshException("WARNING", "You need to select a mesh before exporting")
+    for warning in validate_meshes(meshes, self.skip_meshpoint_validation):
+        self.report({"WARNING"}, warning)
 
     mesh_name = sanitize_mesh_name(mesh_name)
+    mesh_file = os.path.join(export_dir, f"{mesh_name}.mesh")
+    export_data = get_mesh_export_data(meshes)
+    export_hash = get_export_hash(export_data, get_export_options(self))
 
-    full_mesh_path = os.path.join(export_dir, mesh_name)
-    export_gltf_document(full_mesh_path, not self.export_scene)
-    restore_mesh_transforms(original_transforms_arr, meshes)
-
-    mesh = join_meshes(meshes)
+    if export_manifest.is_current(mesh_file, export_hash):
+        status = "Mesh is unchanged, skipped the export of"
+    else:
+        if self.use_meshbuilder:
+            staging_dir = stage_meshbuilder_export(meshes, mesh_name)
+            contents = build_with_meshbuilder(
+                staging_dir, mesh_name, *get_binary_names(meshes)
+            )
+        else:
+            contents = write_mesh_natively(mesh_file, export_data)
 
-    run_meshbuilder(file_path=f"{full_mesh_path}.gltf", dest_path=export_dir)
-    clear_leftovers(export_dir)
+        if write_mesh(mesh_file, export_hash, contents):
+            status = "Mesh exported successfully to"
+        else:
+            status = "Mesh is identical, kept the existing file at"
+        export_manifest.save()
 
-    reader = BinaryReader.initialize_from(
-        mesh_file=os.path.join(export_dir, f"{mesh_name}.mesh")
-    )
-    sanitize_mesh_binary(
-        reader, export_dir, mesh_name, get_all_meshes(self.export_scene)
-    )
-    create_and_move_mesh_materials(export_dir, mesh)
+    for mesh in meshes:
+        create_and_move_mesh_materials(export_dir, mesh)
 
     self.report(
         {"INFO"},
-        "Mesh exported successfully to: {} - Finished in: {:.2f}s".format(
-            f"{self.filepath}.mesh", time.time() - now
+        "{}: {} - Finished in: {:.2f}s".format(
+            status, f"{self.filepath}.mesh", time.time() - now
         ),
     )
 
 
-def export_scene(original_transforms_arr):
-    meshes = get_scene_meshes()
+def stage_meshbuilder_export(meshes, mesh_name):
+    """Writes the glTF document into its own staging folder, the target is only written once built"""
+    staging_dir = tempfile.mkdtemp(dir=TEMP_DIR, suffix=".sins2-export.tmp")
 
-    for mesh in meshes:
-        mesh.select_set(True)
-        bpy.context.view_layer.objects.active = mesh
-        apply_transforms(mesh)
-
-        original_transform, original_meshpoint_transforms = get_original_transforms(
-            mesh
+    # export evaluated copies so the user's objects and the undo stack are left alone
+    collection = bpy.data.collections.new("Sins II Export")
+    bpy.context.scene.collection.children.link(collection)
+    try:
+        objects, node_names = create_export_objects(
+            meshes, collection, bpy.context.evaluated_depsgraph_get()
         )
-        original_transforms_arr.append(
-            (original_transform, original_meshpoint_transforms)
+        export_gltf_document(os.path.join(staging_dir, mesh_name), objects, node_names)
+    except:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    finally:
+        for obj in list(collection.objects):
+            data = obj.data
+            bpy.data.objects.remove(obj)
+            if data is not None:
+                bpy.data.meshes.remove(data)
+        bpy.data.collections.remove(collection)
+    return staging_dir
+
+
+def build_with_meshbuilder(staging_dir, mesh_name, meshpoint_names, materials):
+    """Doesn't touch bpy so several builds can run at once, removes the staging folder"""
+    try:
+        run_meshbuilder(
+            file_path=os.path.join(staging_dir, f"{mesh_name}.gltf"),
+            dest_path=staging_dir,
         )
+        with BinaryReader.initialize_from(
+            mesh_file=os.path.join(staging_dir, f"{mesh_name}.mesh")
+        ) as reader:
+            return sanitize_mesh_binary(reader, meshpoint_names, materials)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def get_binary_names(meshes):
+    meshpoint_names = [
+        meshpoint.name
+        for mesh in meshes
+        for meshpoint in mesh.children
+        if meshpoint.type == "EMPTY" and not meshpoint.hide_get()
+    ]
+    materials = sorted(
+        {mat for mesh in meshes for mat in get_avaliable_sorted_materials(mesh)}
+    )
+    return meshpoint_names, materials
 
-        for meshpoint in mesh.children:
-            meshpoint.select_set(True)
-
-        bpy.ops.object.select_all(action="DESELECT")
-
-    return meshes
-
-
-def export_mesh(original_transforms_arr):
-    meshes = get_selected_meshes()
 
-    for mesh in meshes:
-        apply_transforms(mesh)
-
-        original_transform, original_meshpoint_transforms = get_original_transforms(
-            mesh
-        )
-        original_transforms_arr.append(
-            (original_transform, original_meshpoint_transforms)
-        )
+def sanitize_mesh_binary(reader, meshpoint_names, materials):
+    curr_mat_offset = reader.materials_offset_start
+    material_bytes = bytearray()
 
-        for meshpoint in mesh.children:
-            meshpoint.select_set(True)
+    # consume prefixes
+    for material in materials:
+        old_name_length = reader.u32_at_offset(curr_mat_offset)
 
-    return meshes
+        material_name = material.encode("utf-8")
+        material_bytes.extend(pack("I", len(material_name)))
+        material_bytes.extend(material_name)
 
+        curr_mat_offset += 4 + old_name_length
 
-def sanitize_mesh_binary(reader, export_dir, mesh_name, meshes):
+    # the renamed materials change the size, so the result is assembled in a single buffer
+    # sized up front, copying the mesh data straight from the mapped file
+    head_size = reader.materials_offset_start
+    tail_size = len(reader.buffer) - curr_mat_offset
+    new_buffer = bytearray(head_size + len(material_bytes) + tail_size)
+    with memoryview(reader.buffer) as source:
+        new_buffer[:head_size] = source[:head_size]
+        new_buffer[head_size : head_size + len(material_bytes)] = material_bytes
+        new_buffer[head_size + len(material_bytes) :] = source[curr_mat_offset:]
+
+    # meshpoint names keep their length, they are patched in place
     curr_offset = reader.meshpoint_offset_start
-    curr_mat_offset = reader.materials_offset_start
-    new_buffer = bytearray(reader.buffer)
+    for meshpoint_name in meshpoint_names:
+        name_length = reader.u32_at_offset(curr_offset)
+        new_name = re.sub(r"\b-\d+\b", "", meshpoint_name).encode("utf-8")
 
-    for mesh in meshes:
-        for meshpoint in mesh.children:
-            if meshpoint.hide_get():
-                continue
-
-            name_length = reader.u32_at_offset(curr_offset)
-            new_name = re.sub(r"\b-\d+\b", "", meshpoint.name).encode("utf-8")
+        start = 4 + curr_offset
+        end = start + name_length
+        new_buffer[start:end] = pack(f"{len(meshpoint_name)}s", new_name)
 
-            start = 4 + curr_offset
-            end = start + name_length
-            new_buffer[start:end] = pack(f"{len(meshpoint.name)}s", new_name)
+        curr_offset += 4 + name_length + 50
 
-            curr_offset += 4 + name_length + 50
+    return new_buffer
 
-    buffer_end = len(new_buffer)
-    material_bytes = bytearray(new_buffer[: reader.materials_offset_start])
-    mats_sorted = []
-    unique_mats = set()
-
-    for mesh in meshes:
-        for mat in get_avaliable_sorted_materials(mesh):
-            if mat not in unique_mats:
-                unique_mats.add(mat)
-                mats_sorted.append(mat)
 
-    # consume prefixes
-    for material in sorted(mats_sorted):
-        old_name_length = reader.u32_at_offset(curr_mat_offset)
+def get_batch_export_objects(collection):
+    objects = collection.all_objects
+    return sorted(
+        (
+            obj
+            for obj in objects
+            if obj.type == "MESH"
+            and (obj.parent is None or obj.parent.name not in objects)
+        ),
+        key=lambda obj: obj.name,
+    )
 
-        material_name = material.encode("utf-8")
-        material_bytes.extend(pack("I", len(material_name)))
-        material_bytes.extend(material_name)
 
-        curr_mat_offset += 4 + old_name_length
+def get_batch_export_meshes(obj):
+    # meshes parented to the object are part of it, like in a scene export
+    return [obj] + [child for child in obj.children_recursive if child.type == "MESH"]
+
+
+def batch_export(self, objects, export_dir, timings=None):
+    """Exports each object to its own mesh, meshbuilder runs for several objects at once.
+    `timings` is filled with the seconds from starting each object until its mesh was written
+    """
+    results, builds, warnings, mesh_names = {}, [], {}, {}
+    timings = {} if timings is None else timings
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+        for obj in objects:
+            start = time.time()
+            try:
+                # copies carry blender's ".001" suffix, which is no valid mesh name
+                mesh_name = sanitize_mesh_name(
+                    obj.name.lower().strip().replace(".", "_")
+                )
+                if not re.match(r"^[a-zA-Z0-9 _-]+$", mesh_name):
+                    raise MeshException(
+                        "ERROR", "Invalid mesh name. Avoid special characters."
+                    )
+                if mesh_name in mesh_names:
+                    raise MeshException(
+                        "ERROR",
+                        f'Exports to the same mesh as "{mesh_names[mesh_name]}": {mesh_name}',
+                    )
+                mesh_names[mesh_name] = obj.name
 
-    material_bytes.extend(new_buffer[curr_mat_offset:buffer_end])
-    new_buffer = material_bytes
+                meshes = get_batch_export_meshes(obj)
+                warnings[obj.name] = validate_meshes(
+                    meshes, self.skip_meshpoint_validation
+                )
 
-    file_path = os.path.join(export_dir, f"{mesh_name}.mesh")
-    with open(file_path, "wb") as f:
-        f.write(new_buffer)
+                mesh_file = os.path.join(export_dir, f"{mesh_name}.mesh")
+                export_data = get_mesh_export_data(meshes)
+                export_hash = get_export_hash(export_data, get_export_options(self))
+
+                if export_manifest.is_current(mesh_file, export_hash):
+                    results[obj.name] = ("INFO", "unchanged, skipped")
+                elif self.use_meshbuilder:
+                    staging_dir = stage_meshbuilder_export(meshes, mesh_name)
+                    future = pool.submit(
+                        build_with_meshbuilder,
+                        staging_dir,
+                        mesh_name,
+                        *get_binary_names(meshes),
+                    )
+                    builds.append((meshes, mesh_file, export_hash, future, start))
+                    continue
+                else:
+                    contents = write_mesh_natively(mesh_file, export_data)
+                    write_mesh(mesh_file, export_hash, contents)
+                    results[obj.name] = ("INFO", "exported")
+                for mesh in meshes:
+                    create_and_move_mesh_materials(export_dir, mesh)
+            except MeshException as e:
+                results[obj.name] = ("ERROR", e.message)
+            except Exception as e:
+                results[obj.name] = ("ERROR", str(e))
+            timings[obj.name] = time.time() - start
+
+        for meshes, mesh_file, export_hash, future, start in builds:
+            obj = meshes[0]
+            try:
+                write_mesh(mesh_file, export_hash, future.result())
+                for mesh in meshes:
+                    create_and_move_mesh_materials(export_dir, mesh)
+                results[obj.name] = ("INFO", "exported")
+            except MeshException as e:
+                results[obj.name] = ("ERROR", e.message)
+            except Exception as e:
+                results[obj.name] = ("ERROR", str(e))
+            timings[obj.name] = time.time() - start
+
+    export_manifest.save()
+
+    # exported objects still mention the problems that didn't block them
+    for name, object_warnings in warnings.items():
+        kind, message = results[name]
+        if kind == "INFO" and object_warnings:
+            results[name] = (kind, "; ".join([message, *object_warnings]))
+    return {obj.name: results[obj.name] for obj in objects}
 
 
 class SINSII_OT_Export_Mesh(bpy.types.Operator, ExportHelper):
@@ -1446,6 +1786,11 @@ class SINSII_OT_Export_Mesh(bpy.types.Operator, ExportHelper):
         name="Skip Meshpoint Validation",
         description="Might break the mesh with certain names. Use cautiously.",
     )
+    use_meshbuilder: bpy.props.BoolProperty(
+        default=True,
+        name="Use Meshbuilder",
+        description="Export through glTF and meshbuilder.exe. The native writer is experimental",
+    )
 
     def invoke(self, context, event):
         try:
@@ -1459,9 +1804,8 @@ class SINSII_OT_Export_Mesh(bpy.types.Operator, ExportHelper):
         return context.mode == "OBJECT"
 
     def execute(self, context):
-        __ = self.filepath.rsplit("\\", 1)
-        EXPORT_DIR = __[0]
-        MESH_NAME = __[1].lower().strip()
+        EXPORT_DIR, MESH_NAME = os.path.split(self.filepath)
+        MESH_NAME = MESH_NAME.lower().strip()
 
         try:
             export(self, MESH_NAME, EXPORT_DIR)
@@ -1477,68 +1821,392 @@ class SINSII_OT_Export_Mesh(bpy.types.Operator, ExportHelper):
         return {"FINISHED"}
 
 
+class SINSII_OT_Batch_Export_Meshes(bpy.types.Operator):
+    bl_idname = "sinsii.batch_export_meshes"
+    bl_label = "Batch export"
+    bl_description = (
+        "Exports every top-level mesh of a collection to its own .mesh file"
+    )
+    bl_options = {"REGISTER"}
+
+    directory: bpy.props.StringProperty(subtype="DIR_PATH")
+    filter_folder: bpy.props.BoolProperty(default=True, options={"HIDDEN"})
+
+    collection: bpy.props.StringProperty(name="Collection")
+    skip_meshpoint_validation: bpy.props.BoolProperty(
+        default=False,
+        name="Skip Meshpoint Validation",
+        description="Might break the mesh with certain names. Use cautiously.",
+    )
+    use_meshbuilder: bpy.props.BoolProperty(
+        default=True,
+        name="Use Meshbuilder",
+        description="Export through glTF and meshbuilder.exe. The native writer is experimental",
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == "OBJECT"
+
+    def invoke(self, context, event):
+        if context.collection and context.collection != context.scene.collection:
+            self.collection = context.collection.name
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def draw(self, context):
+        self.layout.prop_search(self, "collection", bpy.data, "collections")
+        self.layout.prop(self, "skip_meshpoint_validation")
+        self.layout.prop(self, "use_meshbuilder")
+
+    def execute(self, context):
+        now = time.time()
+        # an empty name stands for the scene's own collection
+        collection = (
+            bpy.data.collections.get(self.collection)
+            if self.collection
+            else context.scene.collection
+        )
+        if collection is None:
+            self.report({"ERROR"}, f'Collection "{self.collection}" does not exist')
+            return {"CANCELLED"}
+
+        objects = get_batch_export_objects(collection)
+        if not objects:
+            self.report({"WARNING"}, f'No meshes to export in "{collection.name}"')
+            return {"CANCELLED"}
+
+        results = batch_export(self, objects, self.directory)
+        failed = 0
+        for name, (kind, message) in results.items():
+            print(f"{name}: {message}")
+            if kind != "INFO":
+                failed += 1
+                self.report({"WARNING"}, f"Could not export {name}: {message}")
+
+        self.report(
+            {"WARNING" if failed else "INFO"},
+            "Exported {} of {} meshes to: {} - Finished in: {:.2f}s".format(
+                len(results) - failed, len(results), self.directory, time.time() - now
+            ),
+        )
+        return {"FINISHED"}
+
+
 def set_node_position(node, x, y):
     node.location = (x * 100, y * -100)
 
 
-def add_color_ramp_driver(node_id, node, name, data_path):
-    is_emissive = 2 if name == "Emissive" else 1
-    for i, driver in enumerate(
-        node_id.driver_add(
-            f'nodes["{node.name}"].color_ramp.elements[{is_emissive}].color'
-        )
-    ):
-        add_driver(node_id, node, name, f"{data_path}[{i}]", driver.driver)
+def get_dds_image(texture):
+    source = os.path.normcase(os.path.abspath(texture))
+    return next(
+        (image for image in bpy.data.images if image.get("sins2_source") == source),
+        None,
+    )
+
+
+def set_image_pixels(image, pixels):
+    height, width = pixels.shape[:2]
+    if tuple(image.size) != (width, height):
+        image.scale(width, height)
+    # blender stores rows bottom to top
+    image.pixels.foreach_set(pixels[::-1].ravel() / np.float32(255))
+    image.update()
 
 
-def add_driver(node_id, node, name, data_path, driver):
-    driver = driver
-    driver.type = "SUM"
-    var = driver.variables.new()
-    var.name = name
-    var.targets[0].id_type = "SCENE"
-    var.targets[0].id = bpy.context.scene
-    var.targets[0].data_path = data_path
+def is_converted_format(reader, mip_level):
+    # decoding a full size BC7 texture with NumPy takes seconds, texconv's output is cached
+    return reader.format == "bc7" and mip_level == 0
 
 
-def load_texture(node, texture):
+def decode_texture(texture, mip_level):
+    """Runs off the main thread, falls back to texconv when the DDS reader can't decode the texture"""
     try:
-        # convert to usable formats for blender
-        tex_file = os.path.basename(texture)
-        tmp_texture_path = os.path.join(TEMP_TEXTURES_PATH, tex_file)
-
-        if not os.path.exists(tmp_texture_path):
-            run_texconv(texture, TEMP_TEXTURES_PATH)
-        if not bpy.data.images.get(tex_file):
-            node.image = bpy.data.images.load(tmp_texture_path)
-        node.image = bpy.data.images[tex_file]
-    except:
-        if node.label == "_clr":
-            node.image = bpy.data.images.load(
-                os.path.join(CWD_PATH, "texture_error.png")
+        reader = DDSReader.initialize_from(texture)
+    except Exception:
+        return None, texture_cache.convert(texture)
+    if is_converted_format(reader, mip_level):
+        try:
+            return None, texture_cache.convert(texture)
+        except Exception as e:
+            print(f"Could not convert {texture}, decoding it instead: {e}")
+
+    mip_level = min(mip_level, reader.mip_count - 1)
+    pixels = texture_cache.get_pixels(texture, mip_level)
+    if pixels is None:
+        pixels = reader.mip(mip_level)
+        texture_cache.put_pixels(texture, mip_level, pixels)
+    return pixels, None
+
+
+def stream_texture(image, mip_level):
+    """Decodes the image's source in the background, the pixels are swapped in by a timer"""
+    global texture_pool
+    if texture_pool is None:
+        texture_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+    image["sins2_mip_level"] = mip_level
+    if "sins2_unloaded" in image:
+        del image["sins2_unloaded"]
+    image_manager.touch(image)
+    texture_jobs[image.name] = texture_pool.submit(
+        decode_texture, image["sins2_source"], mip_level
+    )
+    # timers never fire in background mode, callers flush the jobs themselves there
+    if not bpy.app.background and not bpy.app.timers.is_registered(
+        apply_streamed_textures
+    ):
+        bpy.app.timers.register(apply_streamed_textures, first_interval=0.1)
+
+
+def set_texture_error(image):
+    """Swaps an image that failed to decode for the error texture, like load_texture does"""
+    error = bpy.data.images.load(
+        os.path.join(CWD_PATH, "texture_error.png"), check_existing=True
+    )
+    for material in bpy.data.materials:
+        if not material.node_tree:
+            continue
+        for node in material.node_tree.nodes:
+            if node.type == "TEX_IMAGE" and node.image == image:
+                node.image = error if node.label == "_clr" else None
+    bpy.data.images.remove(image)
+
+
+def apply_streamed_textures(wait=False):
+    for name, future in list(texture_jobs.items()):
+        if not wait and not future.done():
+            continue
+        del texture_jobs[name]
+        image = bpy.data.images.get(name)
+        if image is None:
+            continue
+
+        try:
+            pixels, converted_texture = future.result()
+        except Exception as e:
+            print(f"Could not load {image.get('sins2_source')}: {e}")
+            set_texture_error(image)
+            continue
+
+        if pixels is not None:
+            set_image_pixels(image, pixels)
+        else:
+            # texconv output is a regular file, swap it in for the placeholder everywhere
+            converted = bpy.data.images.load(converted_texture, check_existing=True)
+            if converted == image:
+                continue
+            converted.colorspace_settings.name = image.colorspace_settings.name
+            converted["sins2_source"] = image["sins2_source"]
+            converted["sins2_mip_level"] = image["sins2_mip_level"]
+            image.user_remap(converted)
+            bpy.data.images.remove(image)
+            converted.name = name
+
+    if texture_jobs:
+        return 0.1
+    texture_cache.save_manifest()
+    return None
+
+
+def manage_images():
+    for image in image_manager.update():
+        stream_texture(image, image.get("sins2_mip_level", 0))
+    return IMAGE_MANAGER_INTERVAL
+
+
+def load_dds_image(texture, mip_level=0):
+    image = get_dds_image(texture)
+    if image and image["sins2_mip_level"] <= mip_level:
+        if image.get("sins2_unloaded"):
+            stream_texture(image, image["sins2_mip_level"])
+        return image
+
+    if image is None:
+        # placeholder until the texture is decoded, generated pixels aren't saved
+        # with the .blend so they are read back from the texture cache on load
+        image = bpy.data.images.new(
+            os.path.basename(texture), width=1, height=1, alpha=True
+        )
+        image.generated_color = (0.5, 0.5, 0.5, 1)
+        image["sins2_source"] = os.path.normcase(os.path.abspath(texture))
+    stream_texture(image, mip_level)
+    return image
+
+
+def get_object_textures(obj):
+    mesh_materials_path = obj.get("sins2_mesh_materials_path")
+    textures_path = obj.get("sins2_textures_path")
+    if not mesh_materials_path or not textures_path:
+        return []
+
+    textures = []
+    for slot in obj.material_slots:
+        if not slot.material or not slot.material.get("sins2_key"):
+            continue
+        # the material may have been renamed, the key keeps the name it was imported with
+        material_name = json.loads(slot.material["sins2_key"])[1]
+        textures.extend(
+            texture
+            for texture in load_mesh_material(
+                material_name, mesh_materials_path, textures_path
             )
+            if texture and os.path.exists(texture)
+        )
+    return textures
+
+
+def warm_texture(texture):
+    """Runs off the main thread, converts the textures the DDS reader doesn't decode ahead of time"""
+    try:
+        reader = DDSReader.initialize_from(texture)
+    except Exception:
+        texture_cache.convert(texture)
+        return
+    if is_converted_format(reader, 0):
+        texture_cache.convert(texture)
+
+
+def warm_file(file_path):
+    with open(file_path, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+
+
+def prefetch_image(texture):
+    image = get_dds_image(texture)
+    if image and image.get("sins2_unloaded"):
+        stream_texture(image, image.get("sins2_mip_level", 0))
+
+
+def queue_prefetches():
+    global prefetch_selection, prefetch_hdri
+    selection = {
+        obj.name
+        for obj in bpy.context.view_layer.objects.selected
+        if obj.type == "MESH" and obj.get("sins2_textures_path")
+    }
+    queued = {path for path, _, _ in prefetch_queue}
+    for name in selection - prefetch_selection:
+        for texture in get_object_textures(bpy.data.objects[name]):
+            if texture not in queued:
+                queued.add(texture)
+                prefetch_queue.append((texture, warm_texture, prefetch_image))
+    prefetch_selection = selection
+
+    hdri_path = bpy.context.scene.mesh_properties.hdri_path
+    if hdri_path != prefetch_hdri:
+        prefetch_hdri = hdri_path
+        if os.path.isfile(hdri_path):
+            # only the file is read ahead, loading the image would stall the main thread
+            prefetch_queue.append((hdri_path, warm_file, None))
+
+
+def get_view_matrices():
+    return [
+        tuple(map(tuple, space.region_3d.view_matrix))
+        for window in bpy.context.window_manager.windows
+        for area in window.screen.areas
+        if area.type == "VIEW_3D"
+        for space in area.spaces
+        if space.type == "VIEW_3D" and space.region_3d
+    ]
+
+
+def prefetch_textures():
+    """Prefetches the textures of the selected meshes and the HDRI while the user is idle"""
+    global prefetch_job, texture_pool, prefetch_views, last_interaction
+    # orbiting or panning the viewport doesn't update the depsgraph, the views tell instead
+    views = get_view_matrices()
+    if views != prefetch_views:
+        prefetch_views = views
+        last_interaction = time.monotonic()
+    # yield to the user and to imports, whose textures are streamed through the same pool
+    if time.monotonic() - last_interaction < PREFETCH_IDLE_SECONDS or texture_jobs:
+        return PREFETCH_INTERVAL
+    if prefetch_job and not prefetch_job[0].done():
+        return PREFETCH_INTERVAL
+
+    start = time.perf_counter()
+    if prefetch_job:
+        future, path, on_prefetched = prefetch_job
+        prefetch_job = None
+        try:
+            future.result()
+            if on_prefetched:
+                on_prefetched(path)
+        except Exception as e:
+            print(f"Could not prefetch {path}: {e}")
+
+    queue_prefetches()
+    if prefetch_queue:
+        if texture_pool is None:
+            texture_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        # a single job in flight keeps the prefetcher to one worker thread
+        path, warm, on_prefetched = prefetch_queue.popleft()
+        prefetch_job = (texture_pool.submit(warm, path), path, on_prefetched)
+
+    # space out the ticks so the main thread time spent here stays under its share
+    elapsed = time.perf_counter() - start
+    return max(
+        PREFETCH_INTERVAL, elapsed * (1 - PREFETCH_CPU_SHARE) / PREFETCH_CPU_SHARE
+    )
+
+
+@bpy.app.handlers.persistent
+def track_interaction(scene, depsgraph):
+    global last_interaction
+    # streamed textures update their images, only other changes come from the user
+    if any(not isinstance(update.id, bpy.types.Image) for update in depsgraph.updates):
+        last_interaction = time.monotonic()
+
+
+def get_preview_images():
+    return [image for image in bpy.data.images if image.get("sins2_mip_level", 0) > 0]
+
+
+@bpy.app.handlers.persistent
+def reload_dds_images(dummy=None):
+    global prefetch_job, prefetch_selection, prefetch_hdri
+    # jobs of the previous file refer to images that no longer exist
+    texture_jobs.clear()
+    prefetch_queue.clear()
+    prefetch_job = None
+    prefetch_selection = set()
+    prefetch_hdri = ""
+    for image in bpy.data.images:
+        source = image.get("sins2_source")
+        if source and os.path.exists(source):
+            stream_texture(image, image.get("sins2_mip_level", 0))
+    # no timer applies the jobs in background mode, and pending ones would hold up the exit
+    if bpy.app.background:
+        apply_streamed_textures(wait=True)
+
+
+def load_texture(node, texture, mip_level=0):
+    if texture and os.path.exists(texture):
+        node.image = load_dds_image(texture, mip_level)
+    elif node.label == "_clr":
+        node.image = bpy.data.images.load(os.path.join(CWD_PATH, "texture_error.png"))
 
     if node.image and node.label != "_clr":
         node.image.colorspace_settings.name = "Non-Color"
 
 
 def load_mesh_material(name, filepath, textures_path):
-    mesh_material = os.path.join(filepath, f"{name}.mesh_material")
+    contents = asset_index.mesh_material(filepath, name)
     # If no mesh_material file exists, look for textures in game directory
-    if not os.path.exists(mesh_material):
-        if os.path.exists(textures_path):
-            texture_base = os.path.join(textures_path, name)
+    if contents is None:
+        if asset_index.has_directory(textures_path, ".dds"):
             return [
-                (
-                    f"{texture_base}_{tex_map}.dds"
-                    if os.path.exists(f"{texture_base}_{tex_map}.dds")
-                    else ""
+                (texture["path"] if texture else "")
+                for texture in (
+                    asset_index.texture(textures_path, f"{name}_{tex_map}")
+                    for tex_map in ["clr", "orm", "msk", "nrm"]
                 )
-                for tex_map in ["clr", "orm", "msk", "nrm"]
             ]
         return [None, None, None, None]
 
-    contents = json.load(open(mesh_material, "r"))
     return [
         (
             os.path.join(
@@ -1557,7 +2225,9 @@ def load_mesh_material(name, filepath, textures_path):
     ]
 
 
-def create_rebellion_shader_nodes(material_name, mesh_materials_path, textures_path):
+def create_rebellion_shader_nodes(
+    material_name, mesh_materials_path, textures_path, mip_level=0
+):
 
     textures = load_mesh_material(material_name, mesh_materials_path, textures_path)
 
@@ -1572,7 +2242,7 @@ def create_rebellion_shader_nodes(material_name, mesh_materials_path, textures_p
     _clr = nodes.new(type="ShaderNodeTexImage")
     set_node_position(_clr, -16, 0)
     _clr.label = "_clr"
-    load_texture(_clr, textures[0])
+    load_texture(_clr, textures[0], mip_level)
     _clr.image.alpha_mode = "NONE"
 
     links = material.node_tree.links
@@ -1606,43 +2276,82 @@ def create_composite_nodes(name="Sins 2 - Compositor Nodes"):
         pass
 
 
-def create_shader_nodes(material_name, mesh_materials_path, textures_path):
+def get_shader_group():
+    """Returns the shared Sins II shader group, rebuilding it when an older version is found"""
+    shader_group = bpy.data.node_groups.get(SHADER_GROUP_NAME)
+    if shader_group and shader_group.get("sins2_version") == SHADER_GROUP_VERSION:
+        return shader_group
+
+    new_group = create_shader_group()
+    if shader_group:
+        shader_group.user_remap(new_group)
+        bpy.data.node_groups.remove(shader_group)
+    new_group.name = SHADER_GROUP_NAME
+    return new_group
+
+
+def create_scene_attribute(nodes, data_path, x, y):
+    attribute = nodes.new(type="ShaderNodeAttribute")
+    set_node_position(attribute, x, y)
+    attribute.attribute_type = "VIEW_LAYER"
+    attribute.attribute_name = data_path
+    return attribute
+
+
+def create_team_color_mix(nodes, x, y):
+    mix_node = nodes.new(type="ShaderNodeMix")
+    set_node_position(mix_node, x, y)
+    mix_node.data_type = "RGBA"
+    mix_node.blend_type = "MIX"
+    mix_node.inputs[6].default_value = (0, 0, 0, 1)
+    return mix_node
+
+
+def create_shader_group():
+    node_id = bpy.data.node_groups.new(SHADER_GROUP_NAME, "ShaderNodeTree")
+    node_id["sins2_version"] = SHADER_GROUP_VERSION
+    nodes = node_id.nodes
+
+    for name, socket_type in [
+        ("Color", "NodeSocketColor"),
+        ("Alpha", "NodeSocketFloat"),
+        ("ORM", "NodeSocketColor"),
+        ("Mask", "NodeSocketColor"),
+        ("Normal Map", "NodeSocketColor"),
+        ("Has ORM", "NodeSocketFloat"),
+        ("Has Normal Map", "NodeSocketFloat"),
+    ]:
+        node_id.interface.new_socket(name, in_out="INPUT", socket_type=socket_type)
+    node_id.interface.new_socket(
+        "BSDF", in_out="OUTPUT", socket_type="NodeSocketShader"
+    )
 
-    textures = load_mesh_material(material_name, mesh_materials_path, textures_path)
+    group_input = nodes.new(type="NodeGroupInput")
+    set_node_position(group_input, -16, 4)
 
-    material = bpy.data.materials.new(name=material_name)
-    material.use_nodes = True
-    node_id = material.node_tree
-    nodes = material.node_tree.nodes
+    group_output = nodes.new(type="NodeGroupOutput")
+    set_node_position(group_output, 4, 0)
 
-    principled_node = next(node for node in nodes if node.type == "BSDF_PRINCIPLED")
+    principled_node = nodes.new(type="ShaderNodeBsdfPrincipled")
     set_node_position(principled_node, 0, 0)
 
-    _clr = nodes.new(type="ShaderNodeTexImage")
-    set_node_position(_clr, -16, 0)
-    _clr.label = "_clr"
-    load_texture(_clr, textures[0])
-
-    _orm = nodes.new(type="ShaderNodeTexImage")
-    set_node_position(_orm, -16, 2)
-    _orm.label = "_orm"
-    load_texture(_orm, textures[1])
-
-    _msk = nodes.new(type="ShaderNodeTexImage")
-    set_node_position(_msk, -16, 4)
-    _msk.label = "_msk"
-    load_texture(_msk, textures[2])
+    # roughness, metallic and normal stay at their defaults for materials without those maps
+    roughness_mix = nodes.new(type="ShaderNodeMix")
+    set_node_position(roughness_mix, -2, -1)
+    roughness_mix.data_type = "FLOAT"
+    roughness_mix.inputs[2].default_value = 0.5
 
-    _nrm = nodes.new(type="ShaderNodeTexImage")
-    set_node_position(_nrm, -16, 6)
-    _nrm.label = "_nrm"
-    load_texture(_nrm, textures[3])
+    metallic_mix = nodes.new(type="ShaderNodeMix")
+    set_node_position(metallic_mix, -2, 1)
+    metallic_mix.data_type = "FLOAT"
+    metallic_mix.inputs[2].default_value = 0.0
 
-    mapping_node = nodes.new(type="ShaderNodeMapping")
-    set_node_position(mapping_node, -19, 0)
+    geometry_node = nodes.new(type="ShaderNodeNewGeometry")
+    set_node_position(geometry_node, 12, 8)
 
-    tex_coord_node = nodes.new(type="ShaderNodeTexCoord")
-    set_node_position(tex_coord_node, -21, 0)
+    normal_mix = nodes.new(type="ShaderNodeMix")
+    set_node_position(normal_mix, 14, 9)
+    normal_mix.data_type = "VECTOR"
 
     mix_node_1 = nodes.new(type="ShaderNodeMix")
     set_node_position(mix_node_1, -4, -2)
@@ -1658,14 +2367,10 @@ def create_shader_nodes(material_name, mesh_materials_path, textures_path):
     set_node_position(mix_node_team_color, -6, -5)
     mix_node_team_color.data_type = "RGBA"
     mix_node_team_color.blend_type = "MIX"
-    add_driver(
-        node_id,
-        mix_node_team_color,
-        "Toggle Team Color",
-        "mesh_properties.toggle_teamcolor",
-        node_id.driver_add(
-            f'nodes["{mix_node_team_color.name}"].inputs[0].default_value'
-        ).driver,
+
+    # team colors are read from the scene properties directly, no drivers to re-evaluate
+    toggle_attribute = create_scene_attribute(
+        nodes, "mesh_properties.toggle_teamcolor", -9, -6
     )
 
     clamp_node = nodes.new(type="ShaderNodeClamp")
@@ -1685,27 +2390,22 @@ def create_shader_nodes(material_name, mesh_materials_path, textures_path):
     color_ramp.color_ramp.elements[0].position = 0.445
     color_ramp.color_ramp.elements[1].position = 0.560
 
-    color_ramp_2 = nodes.new(type="ShaderNodeValToRGB")
-    set_node_position(color_ramp_2, -7, 5)
-    color_ramp_2.color_ramp.elements[0].color = (0, 0, 0, 1)
-    add_color_ramp_driver(
-        node_id, color_ramp_2, "Team Color - 1", "mesh_properties.team_color_1"
-    )
+    # black to team color over the mask channel, as the driven color ramps used to do
+    team_color_mix_1 = create_team_color_mix(nodes, -7, 5)
+    team_color_1 = create_scene_attribute(nodes, "mesh_properties.team_color_1", -10, 5)
 
-    color_ramp_3 = nodes.new(type="ShaderNodeValToRGB")
-    set_node_position(color_ramp_3, -7, 7)
-    color_ramp_3.color_ramp.elements[0].color = (0, 0, 0, 1)
-    add_color_ramp_driver(
-        node_id, color_ramp_3, "Team Color - 2", "mesh_properties.team_color_2"
-    )
+    team_color_mix_2 = create_team_color_mix(nodes, -7, 7)
+    team_color_2 = create_scene_attribute(nodes, "mesh_properties.team_color_2", -10, 7)
 
-    color_ramp_4 = nodes.new(type="ShaderNodeValToRGB")
-    set_node_position(color_ramp_4, -7, 9)
-    color_ramp_4.color_ramp.elements[0].color = (0, 0, 0, 1)
-    color_ramp_4.color_ramp.elements.new(position=0.5)
-    color_ramp_4.color_ramp.elements[1].color = (0, 0, 0, 1)
-    add_color_ramp_driver(
-        node_id, color_ramp_4, "Emissive", "mesh_properties.team_color_3"
+    # emissive only starts at half of the mask's blue channel
+    emissive_range = nodes.new(type="ShaderNodeMapRange")
+    set_node_position(emissive_range, -9, 9)
+    emissive_range.inputs["From Min"].default_value = 0.5
+    emissive_range.clamp = True
+
+    emissive_mix = create_team_color_mix(nodes, -7, 9)
+    team_color_3 = create_scene_attribute(
+        nodes, "mesh_properties.team_color_3", -10, 10
     )
 
     separate_color_node_3 = nodes.new(type="ShaderNodeSeparateColor")
@@ -1766,8 +2466,8 @@ def create_shader_nodes(material_name, mesh_materials_path, textures_path):
 
     principled_node.inputs["Emission Strength"].default_value = 100
 
-    links = material.node_tree.links
-    links.new(_clr.outputs["Color"], mix_node_team_color.inputs["A"])
+    links = node_id.links
+    links.new(group_input.outputs["Color"], mix_node_team_color.inputs["A"])
     links.new(
         mix_node_team_color.outputs["Result"], principled_node.inputs["Base Color"]
     )
@@ -1775,11 +2475,11 @@ def create_shader_nodes(material_name, mesh_materials_path, textures_path):
     links.new(normal_y_invert_node.outputs["Color"], combine_xyz_node_2.inputs["Y"])
     links.new(mix_node_1.outputs["Result"], mix_node_team_color.inputs["B"])
     links.new(mix_node_2.outputs["Result"], mix_node_1.inputs["B"])
-    links.new(_clr.outputs["Color"], mix_node_2.inputs["B"])
+    links.new(group_input.outputs["Color"], mix_node_2.inputs["B"])
     links.new(multiply_node.outputs["Value"], multiply_node_3.inputs["Value"])
     links.new(subtract_node.outputs["Value"], combine_xyz_node.inputs["X"])
     links.new(subtract_node_2.outputs["Value"], combine_xyz_node.inputs["Y"])
-    links.new(_orm.outputs["Color"], separate_color_node.inputs["Color"])
+    links.new(group_input.outputs["ORM"], separate_color_node.inputs["Color"])
     links.new(separate_color_node.outputs["Green"], clamp_node.inputs["Value"])
     links.new(multiply_node_3.outputs["Value"], subtract_node.inputs["Value"])
     links.new(combine_xyz_node.outputs["Vector"], dot_product_node.inputs[0])
@@ -1794,37 +2494,94 @@ def create_shader_nodes(material_name, mesh_materials_path, textures_path):
     links.new(clamp_node_2.outputs["Result"], square_root_node.inputs["Value"])
     links.new(separate_color_node.outputs["Blue"], color_ramp.inputs["Fac"])
 
-    if textures[1]:
-        links.new(clamp_node.outputs["Result"], principled_node.inputs["Roughness"])
-        links.new(color_ramp.outputs["Color"], principled_node.inputs["Metallic"])
+    links.new(group_input.outputs["Has ORM"], roughness_mix.inputs[0])
+    links.new(clamp_node.outputs["Result"], roughness_mix.inputs[3])
+    links.new(roughness_mix.outputs[0], principled_node.inputs["Roughness"])
+    links.new(group_input.outputs["Has ORM"], metallic_mix.inputs[0])
+    links.new(color_ramp.outputs["Color"], metallic_mix.inputs[3])
+    links.new(metallic_mix.outputs[0], principled_node.inputs["Metallic"])
 
-    if textures[3]:
-        links.new(normal_map_node.outputs["Normal"], principled_node.inputs["Normal"])
+    links.new(group_input.outputs["Has Normal Map"], normal_mix.inputs[0])
+    links.new(geometry_node.outputs["Normal"], normal_mix.inputs[4])
+    links.new(normal_map_node.outputs["Normal"], normal_mix.inputs[5])
+    links.new(normal_mix.outputs[1], principled_node.inputs["Normal"])
 
-    links.new(color_ramp_2.outputs["Color"], mix_node_2.inputs["A"])
+    links.new(team_color_mix_1.outputs[2], mix_node_2.inputs["A"])
     links.new(separate_color_node_3.outputs["Green"], multiply_node.inputs["Value"])
-    links.new(color_ramp_3.outputs["Color"], mix_node_1.inputs["A"])
-    links.new(color_ramp_4.outputs["Color"], principled_node.inputs[26])
-    links.new(_nrm.outputs["Color"], separate_color_node_3.inputs["Color"])
-    links.new(_msk.outputs["Color"], separate_color_node_2.inputs["Color"])
-    links.new(separate_color_node_2.outputs["Red"], color_ramp_2.inputs["Fac"])
-    links.new(separate_color_node_2.outputs["Green"], color_ramp_3.inputs["Fac"])
-    links.new(separate_color_node_2.outputs["Blue"], color_ramp_4.inputs["Fac"])
-    links.new(tex_coord_node.outputs["UV"], mapping_node.inputs["Vector"])
-    links.new(mapping_node.outputs["Vector"], _clr.inputs["Vector"])
-    links.new(mapping_node.outputs["Vector"], _nrm.inputs["Vector"])
-    links.new(mapping_node.outputs["Vector"], _msk.inputs["Vector"])
-    links.new(mapping_node.outputs["Vector"], _orm.inputs["Vector"])
-    links.new(_clr.outputs["Alpha"], principled_node.inputs["Alpha"])
-    links.new(separate_color_node_2.outputs["Blue"], color_ramp_4.inputs["Fac"])
-    links.new(color_ramp_4.outputs["Color"], principled_node.inputs["Emission Color"])
+    links.new(team_color_mix_2.outputs[2], mix_node_1.inputs["A"])
+    links.new(group_input.outputs["Normal Map"], separate_color_node_3.inputs["Color"])
+    links.new(group_input.outputs["Mask"], separate_color_node_2.inputs["Color"])
+    links.new(separate_color_node_2.outputs["Red"], team_color_mix_1.inputs[0])
+    links.new(separate_color_node_2.outputs["Green"], team_color_mix_2.inputs[0])
+    links.new(separate_color_node_2.outputs["Blue"], emissive_range.inputs["Value"])
+    links.new(emissive_range.outputs["Result"], emissive_mix.inputs[0])
+    links.new(team_color_1.outputs["Color"], team_color_mix_1.inputs[7])
+    links.new(team_color_2.outputs["Color"], team_color_mix_2.inputs[7])
+    links.new(team_color_3.outputs["Color"], emissive_mix.inputs[7])
+    links.new(toggle_attribute.outputs["Fac"], mix_node_team_color.inputs[0])
+    links.new(group_input.outputs["Alpha"], principled_node.inputs["Alpha"])
+    links.new(emissive_mix.outputs[2], principled_node.inputs["Emission Color"])
+
+    links.new(principled_node.outputs["BSDF"], group_output.inputs["BSDF"])
+
+    return node_id
+
+
+def create_shader_nodes(material_name, mesh_materials_path, textures_path, mip_level=0):
+
+    textures = load_mesh_material(material_name, mesh_materials_path, textures_path)
+
+    material = bpy.data.materials.new(name=material_name)
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+
+    # the network itself lives in the shared group, the material only holds the textures
+    nodes.remove(next(node for node in nodes if node.type == "BSDF_PRINCIPLED"))
+    output_node = next(node for node in nodes if node.type == "OUTPUT_MATERIAL")
+    set_node_position(output_node, 4, 0)
+
+    shader_node = nodes.new(type="ShaderNodeGroup")
+    shader_node.node_tree = get_shader_group()
+    set_node_position(shader_node, 0, 0)
+    shader_node.inputs["Has ORM"].default_value = 1.0 if textures[1] else 0.0
+    shader_node.inputs["Has Normal Map"].default_value = 1.0 if textures[3] else 0.0
+
+    _clr = nodes.new(type="ShaderNodeTexImage")
+    set_node_position(_clr, -4, 0)
+    _clr.label = "_clr"
+    load_texture(_clr, textures[0], mip_level)
+
+    _orm = nodes.new(type="ShaderNodeTexImage")
+    set_node_position(_orm, -4, 3)
+    _orm.label = "_orm"
+    load_texture(_orm, textures[1], mip_level)
+
+    _msk = nodes.new(type="ShaderNodeTexImage")
+    set_node_position(_msk, -4, 6)
+    _msk.label = "_msk"
+    load_texture(_msk, textures[2], mip_level)
+
+    _nrm = nodes.new(type="ShaderNodeTexImage")
+    set_node_position(_nrm, -4, 9)
+    _nrm.label = "_nrm"
+    load_texture(_nrm, textures[3], mip_level)
+
+    links = material.node_tree.links
+    links.new(_clr.outputs["Color"], shader_node.inputs["Color"])
+    links.new(_clr.outputs["Alpha"], shader_node.inputs["Alpha"])
+    links.new(_orm.outputs["Color"], shader_node.inputs["ORM"])
+    links.new(_msk.outputs["Color"], shader_node.inputs["Mask"])
+    links.new(_nrm.outputs["Color"], shader_node.inputs["Normal Map"])
+    links.new(shader_node.outputs["BSDF"], output_node.inputs["Surface"])
 
     return material
 
 
 classes = (
     SINSII_OT_Import_Mesh,
+    SINSII_OT_Load_Full_Resolution_Textures,
     SINSII_OT_Export_Mesh,
+    SINSII_OT_Batch_Export_Meshes,
     SINSII_OT_Generate_Buffs,
     SINSII_OT_Create_Decal,
     SINSII_OT_Check_For_Updates,
@@ -1859,8 +2616,35 @@ classes = (
 def register():
     for Class in classes:
         bpy.utils.register_class(Class)
+    bpy.app.handlers.load_post.append(reload_dds_images)
+    if not bpy.app.background:
+        bpy.app.timers.register(
+            manage_images, first_interval=IMAGE_MANAGER_INTERVAL, persistent=True
+        )
+        bpy.app.timers.register(
+            prefetch_textures, first_interval=PREFETCH_INTERVAL, persistent=True
+        )
+        bpy.app.handlers.depsgraph_update_post.append(track_interaction)
 
 
 def unregister():
+    global texture_pool, prefetch_job
+    if bpy.app.timers.is_registered(apply_streamed_textures):
+        bpy.app.timers.unregister(apply_streamed_textures)
+    if bpy.app.timers.is_registered(manage_images):
+        bpy.app.timers.unregister(manage_images)
+    if bpy.app.timers.is_registered(prefetch_textures):
+        bpy.app.timers.unregister(prefetch_textures)
+    if track_interaction in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(track_interaction)
+    if texture_pool is not None:
+        texture_pool.shutdown(wait=False, cancel_futures=True)
+        # the module outlives a disable, enabling the add-on again starts a new pool
+        texture_pool = None
+    texture_jobs.clear()
+    prefetch_queue.clear()
+    prefetch_job = None
+    if reload_dds_images in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(reload_dds_images)
     for Class in classes:
         bpy.utils.unregister_class(Class)